@@ -0,0 +1,43 @@
+"""Page and static asset bodies, compressed once and served with content-hash ETags."""
+import gzip
+import hashlib
+from flask import request, Response
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional: without it responses are offered gzip-only
+
+class CachedAsset:
+    """A response body built once, with gzip and brotli copies and a content-hash ETag.
+
+    Header lists are built once per encoding and Cache-Control value, and
+    If-None-Match is answered here, which costs far less than werkzeug's
+    per-response header handling and make_conditional.
+    """
+
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, 9)}
+        if brotli:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+        self.encodings = [e for e in ("br", "gzip") if e in self.bodies]
+        self.headers = {}  # (encoding, cache_control) -> (200 headers, 304 headers)
+
+    def build_headers(self, encoding, cache_control):
+        # Each encoding is different bytes, so each gets its own strong ETag
+        validators = [("ETag", f'"{self.version}-{encoding}"'), ("Cache-Control", cache_control), ("Vary", "Accept-Encoding")]
+        content = [("Content-Type", f"{self.mimetype}; charset=utf-8")]
+        if encoding != "identity":
+            content.append(("Content-Encoding", encoding))
+        return content + validators, validators
+
+    def response(self, cache_control):
+        encoding = request.accept_encodings.best_match(self.encodings) or "identity"
+        key = (encoding, cache_control)
+        headers = self.headers.get(key)
+        if headers is None:
+            headers = self.headers[key] = self.build_headers(encoding, cache_control)
+        if request.if_none_match.contains(f"{self.version}-{encoding}"):
+            return Response(status=304, headers=headers[1])
+        return Response(self.bodies[encoding], headers=headers[0])
@@ -0,0 +1,109 @@
+"""CPU per room broadcast and bytes on the wire for each Socket.IO serializer.
+
+Replays the work one emit(..., room=game_id) does for the app's busiest
+broadcasts: the Socket.IO packet is encoded once, wrapped in Engine.IO
+packets, and each recipient's websocket writer encodes its Engine.IO frame.
+"before" is the stdlib json encoder plus the second json.dumps the emit
+metrics used to make to size every payload; "json" is the orjson codec that
+main.py installs by default and "msgpack" is SOCKETIO_SERIALIZER=msgpack.
+
+    python benchmarks/broadcast.py --recipients 8 --iterations 20000
+
+Prints one JSON object per event and serializer.
+"""
+import json
+import time
+import random
+import argparse
+from array import array
+import orjson
+from engineio import packet as eio_packet
+from socketio.packet import Packet, EVENT
+from socketio.msgpack_packet import MsgPackPacket
+
+class StdlibPacket(Packet):
+    json = json
+
+class OrjsonCodec:
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(data, **kwargs):
+        return orjson.loads(data)
+
+class OrjsonPacket(Packet):
+    json = OrjsonCodec
+
+def payload_size(args):
+    """The per-emit size measurement the metrics wrapper did before packets were metered."""
+    binary = 0
+    def measure(value):
+        nonlocal binary
+        if isinstance(value, (bytes, bytearray)):
+            binary += len(value)
+            return None
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return len(json.dumps(args, separators=(",", ":"), default=measure)) + binary
+
+def drawing_frame(points):
+    # One segment as encode_segment lays it out: a count, the first point, then deltas
+    frame = array("h", [points, random.randint(0, 800), random.randint(0, 600)])
+    frame.extend(random.randint(-8, 8) for _ in range((points - 1) * 2))
+    return frame.tobytes()
+
+def payloads(teams):
+    scores = {f"Team {i}": random.randint(0, 200) for i in range(teams)}
+    return {
+        "drawing_update": {"frame": drawing_frame(6)},
+        "pictionary_guess": {"user": "player7", "guess": "a cat wearing a hat"},
+        "trivia_result": {"user": "player7", "correct": True, "answer": "Jupiter", "scores": scores},
+    }
+
+SERIALIZERS = {"before": StdlibPacket, "json": OrjsonPacket, "msgpack": MsgPackPacket}
+
+def broadcast(packet_class, event, data, recipients, measure_twice):
+    """One room emit; returns the bytes each recipient is sent."""
+    if measure_twice:
+        payload_size((data,))
+    encoded = packet_class(EVENT, data=[event, data]).encode()
+    if not isinstance(encoded, list):
+        encoded = [encoded]
+    eio_pkts = [eio_packet.Packet(eio_packet.MESSAGE, p) for p in encoded]
+    # Every recipient's writer encodes its own frames from the shared packets
+    frames = [pkt.encode() for pkt in eio_pkts]
+    for _ in range(recipients - 1):
+        for pkt in eio_pkts:
+            pkt.encode()
+    return sum(map(len, frames))
+
+def measure(name, packet_class, event, data, recipients, iterations):
+    wire_bytes = broadcast(packet_class, event, data, recipients, name == "before")
+    started = time.process_time()
+    for _ in range(iterations):
+        broadcast(packet_class, event, data, recipients, name == "before")
+    elapsed = time.process_time() - started
+    return {
+        "event": event,
+        "serializer": name,
+        "recipients": recipients,
+        "cpu_us_per_broadcast": round(elapsed / iterations * 1e6, 2),
+        "bytes_per_recipient": wire_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--recipients", type=int, default=8, help="clients in the room")
+    parser.add_argument("--teams", type=int, default=4, help="teams in the scores dict")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    for event, data in payloads(args.teams).items():
+        for name, packet_class in SERIALIZERS.items():
+            result = measure(name, packet_class, event, data, args.recipients, args.iterations)
+            print(json.dumps(result), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Latency and throughput of one worker playing the full game loop.
+
+Starts main.py with gemini_client swapped for a stub whose latency is set on
+the command line, then plays --games concurrent games. Each game has two
+python-socketio clients going through create/join, start, buzz and answer,
+a drawing stream, guesses, Scattergories, CAH submits and the judge's vote,
+--rounds times over. Latencies are taken from emit to the event that answers it.
+--spectators adds that many watchers per game, to check that player latency
+doesn't move with the audience size.
+
+    python benchmarks/gameloop.py --games 20 --rounds 2 --gemini-latency 0.8
+
+Prints one JSON object with per-event p50/p99 latencies, events per second and
+memory per game; --output also writes it to a file for comparing versions.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import queue
+import random
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+from multiprocessing import Pool
+import requests
+import socketio
+from scaling import ROOT, wait_for_port
+
+TRIVIA_ANSWER = "answer"
+
+# Server side
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubGemini:
+    """Answers every prompt main.py sends with canned content after a configurable delay."""
+
+    def __init__(self, latency, jitter):
+        self.latency = latency
+        self.jitter = jitter
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        booleans = re.search(r"array of (\d+) booleans", prompt)
+        if booleans:
+            return StubResponse(json.dumps([True] * int(booleans.group(1))))
+        count = int(re.search(r"Generate (\d+)", prompt).group(1))
+        if "trivia" in prompt:
+            return StubResponse(json.dumps([{"q": f"Question {i}?", "a": TRIVIA_ANSWER} for i in range(count)]))
+        if "Pictionary" in prompt:
+            return StubResponse(json.dumps([{"word": f"word{i}", "hint": "a thing"} for i in range(count)]))
+        if "prompts" in prompt:
+            return StubResponse("\n".join(f"{i}. ___ ruined the party." for i in range(count)))
+        return StubResponse("\n".join(f"{i}. card {i}" for i in range(count)))
+
+def serve(args):
+    sys.path.insert(0, ROOT)
+    import main
+    main.gemini_client = StubGemini(args.gemini_latency, args.gemini_jitter)
+    logging.disable(logging.INFO)
+    main.socketio.run(main.app, host="127.0.0.1", port=args.port, log_output=False)
+
+# Client side
+class Player:
+    def __init__(self, base_url, name, team):
+        self.base_url = base_url
+        self.name = name
+        self.team = team
+        self.http = requests.Session()
+        self.client = socketio.Client(http_session=self.http)
+        self.client.on("*", self.record)
+        self.events = queue.Queue()
+        self.frames = []  # Arrival times of drawing_update events
+        self.sent = 0
+        self.received = 0
+
+    def record(self, event, data=None):
+        now = time.perf_counter()
+        self.received += 1
+        if event == "drawing_update":
+            self.frames.append(now)
+        else:
+            self.events.put((event, data, now))
+
+    def post(self, path, **form):
+        response = self.http.post(f"{self.base_url}{path}", data={"team_name": self.team, "user_name": self.name, **form})
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(f"{path}: {body['error']}")
+        return body
+
+    def connect(self, game_id):
+        self.client.connect(f"{self.base_url}?game_id={game_id}", transports=["websocket"], wait_timeout=30)
+
+    def emit(self, event, data=None):
+        self.sent += 1
+        sent_at = time.perf_counter()
+        self.client.emit(event, data)
+        return sent_at
+
+    def expect(self, event, since, timeout=30):
+        # Skip anything older than `since` or not the event we are waiting for
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                name, data, arrived = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"{self.name} timed out waiting for {event}")
+            if name == event and arrived >= since:
+                return data, arrived
+            if name == "error":
+                raise RuntimeError(f"{self.name} got error while waiting for {event}: {data}")
+
+class Spectator:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.client = socketio.Client()
+        self.client.on("spectator_update", self.record)
+        self.updates = 0
+
+    def record(self, data):
+        self.updates += 1
+
+    def watch(self, game_id):
+        self.client.connect(f"{self.base_url}?game_id={game_id}", transports=["websocket"], wait_timeout=30)
+        self.client.emit("spectate", {"game_id": game_id})
+
+class GameDriver:
+    def __init__(self, base_url, index, draw_points, spectators):
+        self.a = Player(base_url, f"alice{index}", f"Red{index}")
+        self.b = Player(base_url, f"bob{index}", f"Blue{index}")
+        self.spectators = [Spectator(base_url) for _ in range(spectators)]
+        self.draw_points = draw_points
+        self.latencies = {}
+
+    def measure(self, name, sent_at, arrived):
+        self.latencies.setdefault(name, []).append((arrived - sent_at) * 1000)
+
+    def wait_phase(self, since, event="phase_change"):
+        _, loading_at = self.b.expect("phase_loading", since)
+        data, arrived = self.b.expect(event, loading_at)
+        self.measure(f"load_{data['phase']}", loading_at, arrived)
+        return data, arrived
+
+    def play(self, rounds):
+        game_id = self.a.post("/create_game")["game_id"]
+        self.b.post(f"/join_game?game_id={game_id}", game_id=game_id)
+        for player in (self.a, self.b):
+            player.connect(game_id)
+            sent = player.emit("join", {"team": player.team, "game_id": game_id, "user_name": player.name})
+            self.measure("join", sent, player.expect("lobby_snapshot", sent)[1])
+        for spectator in self.spectators:
+            spectator.watch(game_id)
+
+        since = self.a.emit("start_game", {"game_id": game_id})
+        self.wait_phase(since, "game_start")
+        for _ in range(rounds):
+            since = self.play_trivia()
+            since = self.play_pictionary(since)
+            since = self.play_scattergories(since)
+            since = self.play_cah(since)
+            self.wait_phase(since)
+        for player in (self.a, self.b):
+            player.client.disconnect()
+        for spectator in self.spectators:
+            spectator.client.disconnect()
+
+    def play_trivia(self):
+        sent = self.b.emit("buzz")
+        self.measure("buzz", sent, self.b.expect("buzz_response", sent)[1])
+        sent = self.b.emit("trivia_answer", {"answer": TRIVIA_ANSWER})
+        self.measure("trivia_answer", sent, self.b.expect("trivia_result", sent)[1])
+        return sent
+
+    def play_pictionary(self, since):
+        self.wait_phase(since)
+        sent = self.a.emit("start_drawing", {})
+        _, arrived = self.b.expect("pictionary_start", sent)
+        self.measure("start_drawing", sent, arrived)
+        word = self.a.expect("pictionary_start", sent)[0]["word"]  # Guessers are sent "****"
+
+        del self.b.frames[:]
+        sends = [self.a.emit("drawing", {"x": 10, "y": 10, "drawing": True, "start": True})]
+        for i in range(self.draw_points):
+            time.sleep(1 / 60)
+            sends.append(self.a.emit("drawing", {"x": 10 + i, "y": 10 + i // 2, "drawing": True}))
+        time.sleep(0.25)
+        # Each frame carries every point sent since the previous frame arrived,
+        # so its latency is measured from the oldest of those points.
+        previous = 0.0
+        for arrived in list(self.b.frames):
+            pending = [s for s in sends if previous < s <= arrived]
+            if pending:
+                self.measure("drawing_frame", pending[0], arrived)
+            previous = arrived
+
+        sent = self.b.emit("pictionary_guess", {"guess": "not it"})
+        self.measure("guess", sent, self.b.expect("pictionary_guess", sent)[1])
+        sent = self.b.emit("pictionary_guess", {"guess": word})
+        self.measure("guess_correct", sent, self.b.expect("pictionary_result", sent)[1])
+        return sent
+
+    def play_scattergories(self, since):
+        data, _ = self.wait_phase(since)
+        words = [f"{data['letter']}{'abc'[i % 3]}word" for i in range(len(data["categories"]))]
+        sent = self.a.emit("scattergories_submit", {"words": words})
+        self.measure("scattergories_submit", sent, self.a.expect("submission_received", sent)[1])
+        sent = self.b.emit("scattergories_submit", {"words": words})
+        self.measure("scattergories_score", sent, self.b.expect("scattergories_result", sent)[1])
+        return sent
+
+    def play_cah(self, since):
+        data, _ = self.wait_phase(since)
+        judge, player = (self.a, self.b) if data["judge"] == self.a.name else (self.b, self.a)
+        sent = player.emit("cah_submit", {"card": data["cards"][0]})
+        self.measure("cah_submit", sent, judge.expect("cah_voting", sent)[1])
+        sent = judge.emit("cah_vote", {"winner": player.name})
+        self.measure("cah_vote", sent, judge.expect("cah_result", sent)[1])
+        return sent
+
+def run_game(job):
+    base_url, index, rounds, draw_points, spectators = job
+    driver = GameDriver(base_url, index, draw_points, spectators)
+    error = None
+    try:
+        driver.play(rounds)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+        for player in (driver.a, driver.b, *driver.spectators):
+            player.client.disconnect()
+    players = (driver.a, driver.b)
+    return {
+        "latencies": driver.latencies,
+        "sent": sum(p.sent for p in players),
+        "received": sum(p.received for p in players),
+        "spectator_updates": sum(s.updates for s in driver.spectators),
+        "error": error
+    }
+
+# Reporting
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def sample_memory(base_url, pid, peak, stop):
+    # Games are deleted as their players leave, so keep the busiest snapshot
+    while not stop.is_set():
+        try:
+            stats = requests.get(f"{base_url}/game_stats", timeout=5).json()
+            if stats["count"] >= peak.get("games", 0):
+                peak.update(games=stats["count"], total_bytes=stats["total_bytes"])
+        except (requests.RequestException, ValueError):
+            pass
+        rss = rss_bytes(pid)
+        if rss and rss > peak.get("rss_peak_bytes", 0):
+            peak["rss_peak_bytes"] = rss
+        stop.wait(0.25)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(args):
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+               "--gemini-latency", str(args.gemini_latency), "--gemini-jitter", str(args.gemini_jitter)]
+    # Pools fill straight away here; startup.py is the benchmark for cold starts.
+    # No content store or journal: stub content and games must not outlive the
+    # run, or the next one would restore them and skip the Gemini latency.
+    env = dict(os.environ, CONTENT_WARMUP_DELAY="0", CONTENT_STORE="", GAME_JOURNAL="")
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    peak = {}
+    stop = threading.Event()
+    try:
+        wait_for_port(args.port)
+        time.sleep(args.gemini_latency + args.gemini_jitter + 0.5)  # Let the content pools warm up
+        rss_baseline = rss_bytes(server.pid)
+        sampler = threading.Thread(target=sample_memory, args=(base_url, server.pid, peak, stop), daemon=True)
+        sampler.start()
+        jobs = [(base_url, i, args.rounds, args.draw_points, args.spectators) for i in range(args.games)]
+        with Pool(args.games) as pool:
+            started = time.monotonic()
+            results = pool.map(run_game, jobs)
+            elapsed = time.monotonic() - started
+        stop.set()
+        sampler.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = {}
+    for result in results:
+        for name, values in result["latencies"].items():
+            latencies.setdefault(name, []).extend(values)
+    received = sum(r["received"] for r in results)
+    sent = sum(r["sent"] for r in results)
+    errors = [r["error"] for r in results if r["error"]]
+    rss_peak = peak.get("rss_peak_bytes")
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "games": args.games,
+        "rounds": args.rounds,
+        "spectators_per_game": args.spectators,
+        "gemini_latency": args.gemini_latency,
+        "seconds": round(elapsed, 3),
+        "completed_games": len(results) - len(errors),
+        "errors": errors[:5],
+        "client_emits": sent,
+        "server_events": received,
+        "client_emits_per_sec": round(sent / elapsed, 1),
+        "server_events_per_sec": round(received / elapsed, 1),
+        "spectator_updates": sum(r["spectator_updates"] for r in results),
+        "latency_ms": {
+            name: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 2),
+                "p99": round(percentile(values, 99), 2),
+                "max": round(max(values), 2)
+            }
+            for name, values in sorted(latencies.items())
+        },
+        "memory": {
+            "peak_games": peak.get("games"),
+            "game_bytes_per_game": round(peak["total_bytes"] / peak["games"]) if peak.get("games") else None,
+            "rss_baseline_bytes": rss_baseline,
+            "rss_peak_bytes": rss_peak,
+            "rss_per_game_bytes": round((rss_peak - rss_baseline) / args.games) if rss_peak and rss_baseline else None
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--games", type=int, default=10, help="concurrent games, two clients each")
+    parser.add_argument("--rounds", type=int, default=2, help="full trivia-to-CAH loops per game")
+    parser.add_argument("--draw-points", type=int, default=60, help="points streamed per Pictionary round at 60 Hz")
+    parser.add_argument("--spectators", type=int, default=0, help="spectator clients watching each game")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds the stub waits per call")
+    parser.add_argument("--gemini-jitter", type=float, default=0.2, help="extra random delay per call, up to this many seconds")
+    parser.add_argument("--port", type=int, default=5700)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+    result = json.dumps(benchmark(args))
+    print(result, flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of the app behind cluster.py as the number of workers grows.
+
+Each simulated client creates its own game, connects its socket with the game
+ID (so the router pins it to the owning worker) and then calls `join` in a
+loop, which exercises the room join, registry lookup and lobby broadcast path.
+Every completed round-trip counts as one operation. The per-connection rate
+limit is switched off, since a throttled join is still acknowledged; the
+result reports any events the workers dropped anyway, which should be 0.
+Workers run without a content store or game journal, so nothing is left in
+the repository to be restored by the next run.
+
+    python benchmarks/scaling.py --workers 1,2,4 --clients 16 --duration 10
+
+Prints one JSON object per worker count.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+from multiprocessing import Pool
+import requests
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+def run_client(job):
+    base_url, index, duration = job
+    http = requests.Session()
+    response = http.post(f"{base_url}/create_game", data={"team_name": f"Team{index}", "user_name": f"player{index}"})
+    game_id = response.json()["game_id"]
+    client = socketio.Client(http_session=http)
+    client.connect(f"{base_url}?game_id={game_id}", transports=["websocket"], wait_timeout=30)
+    payload = {"team": f"Team{index}", "game_id": game_id, "user_name": f"player{index}"}
+    ops = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        client.call("join", payload, timeout=10)
+        ops += 1
+    client.disconnect()
+    return ops
+
+def throttled_events(port):
+    # socketio_events_throttled_total summed over every event label
+    text = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=10).text
+    return sum(int(float(line.rsplit(" ", 1)[1])) for line in text.splitlines() if line.startswith("socketio_events_throttled_total{"))
+
+def measure(workers, clients, duration, port):
+    env = dict(os.environ, PORT=str(port), CLUSTER_WORKERS=str(workers), CLUSTER_BASE_PORT=str(port + 1),
+               RATE_LIMIT_DEFAULT="0", CONTENT_STORE="", GAME_JOURNAL="")
+    router = subprocess.Popen([sys.executable, "cluster.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        for i in range(workers):
+            wait_for_port(port + 1 + i)
+        base_url = f"http://127.0.0.1:{port}"
+        with Pool(clients) as pool:
+            started = time.monotonic()
+            ops = sum(pool.map(run_client, [(base_url, i, duration) for i in range(clients)]))
+            elapsed = time.monotonic() - started
+        throttled = sum(throttled_events(port + 1 + i) for i in range(workers))
+    finally:
+        router.terminate()
+        router.wait()
+    return {"workers": workers, "clients": clients, "seconds": round(elapsed, 3), "ops": ops, "ops_per_sec": round(ops / elapsed, 1),
+            "throttled": throttled}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to measure")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=5600)
+    args = parser.parse_args()
+    for i, workers in enumerate(int(w) for w in args.workers.split(",")):
+        # Fresh ports per run; the previous run's workers may still be draining
+        port = args.port + 100 * i
+        print(json.dumps(measure(workers, args.clients, args.duration, port)), flush=True)
+
+if __name__ == "__main__":
+    main()
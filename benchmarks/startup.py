@@ -0,0 +1,99 @@
+"""Cold-start cost of one worker: import time and time to first response.
+
+Each run starts `python main.py` in a scratch directory (so no journal or
+content cache is restored) and polls / until it answers; the time from spawn
+to that first 200 is what a dyno wake-up costs the first visitor. Import cost
+is taken separately from `python -X importtime -c "import main"`, along with
+the modules that contribute most to it.
+
+    python benchmarks/startup.py --runs 5
+
+Prints one JSON object; --output also writes it to a file for comparing versions.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from statistics import median
+import requests
+from scaling import ROOT
+from gameloop import git_commit
+
+def summarize(values):
+    return {"median": round(median(values), 3), "min": round(min(values), 3), "max": round(max(values), 3)}
+
+def import_profile(workdir, top):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    command = [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import main"]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, capture_output=True, text=True, env=server_env())
+    elapsed = time.perf_counter() - started
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.strip()))
+    main_us = next((us for us, name in modules if name == "main"), None)
+    # Only top-level packages, so a heavy package isn't listed once per submodule
+    packages = sorted(((us, name) for us, name in modules if "." not in name and name != "main"), reverse=True)
+    return {
+        "process_seconds": round(elapsed, 3),
+        "main_seconds": round(main_us / 1e6, 3) if main_us else None,
+        "heaviest_packages_ms": {name: round(us / 1000, 1) for us, name in packages[:top]}
+    }
+
+def server_env(**extra):
+    # No journal or content store to restore, and no real Gemini key
+    return dict(os.environ, GAME_JOURNAL="", CONTENT_STORE="", GEMINI_API_KEY="startup-benchmark", **extra)
+
+def first_response(workdir, port, timeout):
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=server_env(PORT=str(port)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+                if requests.get(f"http://127.0.0.1:{port}/", timeout=5).status_code == 200:
+                    return time.perf_counter() - started
+            except (OSError, requests.RequestException):
+                time.sleep(0.005)
+        raise RuntimeError(f"No response on port {port} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imported packages to list")
+    parser.add_argument("--port", type=int, default=5800)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        imports = import_profile(workdir, args.top)
+        # A fresh port per run; the last server's socket may still be in TIME_WAIT
+        firsts = [first_response(workdir, args.port + i, args.timeout) for i in range(args.runs)]
+    summary = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "first_response_seconds": summarize(firsts),
+        "import": imports
+    }
+    result = json.dumps(summary)
+    print(result, flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+
+if __name__ == "__main__":
+    main()
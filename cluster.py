@@ -0,0 +1,284 @@
+"""Run several eventlet workers of main.py on one box.
+
+`python cluster.py` listens on $PORT, starts CLUSTER_WORKERS copies of the app
+on local ports and routes every HTTP request and socket connection to the
+worker that owns its game (see worker_for_game). Requests without a game ID go
+round-robin, except Socket.IO traffic, which has to stay on one worker per
+session and goes to worker 0 until the client reconnects with its game ID, and
+/leaderboard, which always goes to LEADERBOARD_WORKER.
+
+Unless MESSAGE_QUEUE / STATE_STORE point at a real service such as Redis, the
+router also hosts a small local broker that the workers use for cross-worker
+Socket.IO broadcasts and the shared game store.
+"""
+import os
+import json
+import signal
+import socket
+import time
+import logging
+import itertools
+import subprocess
+import zlib
+from collections import defaultdict
+from urllib.parse import urlparse, parse_qs
+import eventlet
+from eventlet.semaphore import Semaphore
+import socketio
+
+logger = logging.getLogger(__name__)
+
+MAX_HEAD_BYTES = 65536
+DEFAULT_WORKER_CMD = "gunicorn -k eventlet -w 1 -b 127.0.0.1:{port} main:app"
+LEADERBOARD_WORKER = 0  # Keeps the one board; the other workers publish their points to it
+
+def worker_for_game(game_id, worker_count):
+    return zlib.crc32(game_id.encode()) % worker_count
+
+def broker_address(url):
+    parsed = urlparse(url)
+    return parsed.hostname, parsed.port
+
+# Local broker
+class BrokerServer:
+    """JSON-lines pub/sub and key/value server standing in for Redis on one box."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.listener = eventlet.listen((host, port))
+        self.port = self.listener.getsockname()[1]
+        self.store = {}
+        self.subscribers = defaultdict(dict)  # channel -> {writer: lock}
+
+    def serve(self):
+        pool = eventlet.GreenPool()
+        while True:
+            sock, _ = self.listener.accept()
+            pool.spawn_n(self.handle, sock)
+
+    def handle(self, sock):
+        rfile = sock.makefile("rb")
+        wfile = sock.makefile("wb")
+        try:
+            for line in rfile:
+                message = json.loads(line)
+                op = message["op"]
+                if op == "sub":
+                    self.subscribers[message["channel"]][wfile] = Semaphore()
+                    continue
+                if op == "pub":
+                    self.publish(message["channel"], message["data"])
+                    continue
+                if op == "set":
+                    self.store[message["key"]] = message["value"]
+                    result = True
+                elif op == "get":
+                    result = self.store.get(message["key"])
+                elif op == "delete":
+                    result = self.store.pop(message["key"], None) is not None
+                else:
+                    result = None
+                wfile.write(json.dumps({"result": result}).encode() + b"\n")
+                wfile.flush()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Broker connection dropped: {str(e)}")
+        finally:
+            for subscribers in self.subscribers.values():
+                subscribers.pop(wfile, None)
+            sock.close()
+
+    def publish(self, channel, data):
+        line = json.dumps(data).encode() + b"\n"
+        for writer, lock in list(self.subscribers[channel].items()):
+            try:
+                with lock:
+                    writer.write(line)
+                    writer.flush()
+            except OSError:
+                self.subscribers[channel].pop(writer, None)
+
+class BrokerClient:
+    """Key/value and publish client for BrokerServer, safe to share between greenlets."""
+
+    def __init__(self, url):
+        self.address = broker_address(url)
+        self.lock = Semaphore()
+        self.sock = None
+
+    def call(self, op, **fields):
+        with self.lock:
+            if self.sock is None:
+                self.sock = socket.create_connection(self.address)
+                self.rfile = self.sock.makefile("rb")
+            try:
+                self.sock.sendall(json.dumps({"op": op, **fields}).encode() + b"\n")
+                if op == "pub":
+                    return None
+                return json.loads(self.rfile.readline())["result"]
+            except (OSError, ValueError):
+                self.sock.close()
+                self.sock = None
+                raise
+
+    def get(self, key):
+        return self.call("get", key=key)
+
+    def set(self, key, value):
+        return self.call("set", key=key, value=value)
+
+    def delete(self, key):
+        return self.call("delete", key=key)
+
+    def publish(self, channel, data):
+        return self.call("pub", channel=channel, data=data)
+
+def subscribe(url, channel):
+    """Yield every line published on a BrokerServer channel, reconnecting if the broker goes away."""
+    while True:
+        try:
+            with socket.create_connection(broker_address(url)) as sock:
+                sock.sendall(json.dumps({"op": "sub", "channel": channel}).encode() + b"\n")
+                for line in sock.makefile("rb"):
+                    yield line
+        except OSError as e:
+            logger.error(f"Lost connection to local broker: {str(e)}")
+        eventlet.sleep(1)
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """Socket.IO client manager that fans emits out to every worker through BrokerServer."""
+
+    name = "local"
+
+    def __init__(self, url, channel="flask-socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self.publisher = BrokerClient(url)
+
+    def _publish(self, data):
+        self.publisher.publish(self.channel, data)
+
+    def _listen(self):
+        return subscribe(self.url, self.channel)
+
+# Router
+def pick_worker(head, worker_count, round_robin):
+    target = head.split(b"\r\n", 1)[0].split(b" ")[1].decode("latin-1")
+    url = urlparse(target)
+    game_id = parse_qs(url.query).get("game_id", [""])[0].upper().strip()
+    if game_id:
+        return worker_for_game(game_id, worker_count)
+    if url.path.startswith("/socket.io"):
+        return 0
+    if url.path == "/leaderboard":
+        return LEADERBOARD_WORKER % worker_count
+    return next(round_robin) % worker_count
+
+def force_close(head):
+    # One upstream connection per request, so keep-alive can't carry a request
+    # for another game to the wrong worker.
+    header_end = head.index(b"\r\n\r\n")
+    lines = [line for line in head[:header_end].split(b"\r\n") if not line.lower().startswith(b"connection:")]
+    return b"\r\n".join(lines) + b"\r\nConnection: close" + head[header_end:]
+
+def pipe(source, dest, half_close):
+    try:
+        while True:
+            chunk = source.recv(65536)
+            if not chunk:
+                break
+            dest.sendall(chunk)
+    except (OSError, EOFError):
+        pass  # The other direction closed both sockets
+    if half_close:
+        try:
+            dest.shutdown(socket.SHUT_WR)
+            return
+        except OSError:
+            pass
+    source.close()
+    dest.close()
+
+def proxy(client, ports, round_robin):
+    head = b""
+    while b"\r\n\r\n" not in head:
+        try:
+            chunk = client.recv(65536)
+        except (OSError, EOFError):
+            chunk = b""
+        if not chunk or len(head) > MAX_HEAD_BYTES:
+            client.close()
+            return
+        head += chunk
+    header_end = head.index(b"\r\n\r\n")
+    if b"upgrade: websocket" not in head[:header_end].lower():
+        head = force_close(head)
+    try:
+        upstream = eventlet.connect(("127.0.0.1", ports[pick_worker(head, len(ports), round_robin)]))
+    except (OSError, IndexError):
+        client.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        client.close()
+        return
+    upstream.sendall(head)
+    eventlet.spawn_n(pipe, client, upstream, True)
+    pipe(upstream, client, False)
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            eventlet.connect(("127.0.0.1", port)).close()
+            return True
+        except OSError:
+            eventlet.sleep(0.1)
+    return False
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    port = int(os.environ.get("PORT", 5000))
+    worker_count = int(os.environ.get("CLUSTER_WORKERS", os.cpu_count() or 1))
+    base_port = int(os.environ.get("CLUSTER_BASE_PORT", port + 1))
+    worker_cmd = os.environ.get("CLUSTER_WORKER_CMD", DEFAULT_WORKER_CMD)
+
+    env = dict(os.environ, WORKER_COUNT=str(worker_count))
+    if not (env.get("MESSAGE_QUEUE") and env.get("STATE_STORE")):
+        broker = BrokerServer()
+        eventlet.spawn_n(broker.serve)
+        local_url = f"local://127.0.0.1:{broker.port}"
+        env.setdefault("MESSAGE_QUEUE", local_url)
+        env.setdefault("STATE_STORE", local_url)
+        logger.info(f"Local broker listening on port {broker.port}")
+
+    ports = [base_port + i for i in range(worker_count)]
+    workers = [
+        subprocess.Popen(worker_cmd.format(port=worker_port).split(), env=dict(env, WORKER_INDEX=str(i), PORT=str(worker_port)))
+        for i, worker_port in enumerate(ports)
+    ]
+
+    def stop_workers():
+        for worker in workers:
+            worker.terminate()
+
+    def shutdown(signum, frame):
+        # Signals arrive in whichever greenlet is running, so stop the workers
+        # here instead of relying on the finally clause below.
+        stop_workers()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        for worker_port in ports:
+            if not wait_for_port(worker_port):
+                logger.error(f"Worker on port {worker_port} did not start")
+
+        listener = eventlet.listen(("0.0.0.0", port))
+        round_robin = itertools.count()
+        pool = eventlet.GreenPool(10000)
+        logger.info(f"Routing port {port} to {worker_count} workers on ports {ports[0]}-{ports[-1]}")
+        while True:
+            client, _ = listener.accept()
+            pool.spawn_n(proxy, client, ports, round_robin)
+    finally:
+        stop_workers()
+
+if __name__ == "__main__":
+    main()
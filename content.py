@@ -0,0 +1,254 @@
+"""Generated round content: pre-filled pools per key, backed by an SQLite store.
+
+Pools hand content to games without waiting on Gemini; the store keeps what
+was generated across restarts, along with Scattergories verdicts.
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from collections import defaultdict, deque
+import eventlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+
+logger = logging.getLogger(__name__)
+
+def content_digest(item):
+    return hashlib.sha1(json.dumps(item, sort_keys=True).encode()).hexdigest()
+
+class NullContentStore:
+    """Keeps nothing; used when CONTENT_STORE is empty."""
+
+    def take(self, kind, key, count):
+        return []
+
+    def add(self, kind, key, items):
+        pass
+
+    def mark_served(self, kind, key, items):
+        pass
+
+    def get_verdicts(self, keys):
+        return {}
+
+    def put_verdicts(self, verdicts):
+        pass
+
+class ContentStore:
+    """SQLite copy of generated content and Scattergories verdicts that survives restarts.
+
+    Nothing is read at boot: the database is opened on first use and every
+    lookup is an indexed LIMIT query, so startup cost doesn't grow with the
+    file. Items count as served only when a pool hands them to a game; an
+    item is not offered again for repeat_after seconds and is retired after
+    max_serves games. Verdicts older than verdict_ttl seconds are ignored.
+    Queries run on eventlet's thread pool, and a failing store only costs the
+    caller a trip to Gemini.
+    """
+
+    def __init__(self, path, max_items, max_verdicts, repeat_after, max_serves, verdict_ttl):
+        self.path = path
+        self.max_items = max_items
+        self.max_verdicts = max_verdicts
+        self.repeat_after = repeat_after
+        self.max_serves = max_serves
+        self.verdict_ttl = verdict_ttl
+        self.db = None
+        self.lock = Semaphore()
+        self.reserved = defaultdict(dict)  # (kind, key) -> {digest: row id} sitting in a pool, not yet served
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS content (
+            id INTEGER PRIMARY KEY, kind TEXT, key TEXT, digest TEXT, item TEXT,
+            created REAL, serves INTEGER DEFAULT 0, served_at REAL,
+            UNIQUE (kind, key, digest))""")
+        db.execute("CREATE INDEX IF NOT EXISTS content_fresh ON content (kind, key, serves, served_at)")
+        db.execute("""CREATE TABLE IF NOT EXISTS verdicts (
+            word TEXT, category TEXT, letter TEXT, verdict INTEGER, stored_at REAL,
+            PRIMARY KEY (word, category, letter))""")
+        db.execute("CREATE INDEX IF NOT EXISTS verdicts_age ON verdicts (stored_at)")
+        db.commit()
+        return db
+
+    def run(self, query, *args, default=None):
+        try:
+            with self.lock:
+                if self.db is None:
+                    self.db = tpool.execute(self.connect)
+                return tpool.execute(query, self.db, *args)
+        except sqlite3.Error as e:
+            logger.error(f"Content store {self.path} failed: {str(e)}")
+            return default
+
+    def take(self, kind, key, count):
+        reserved = self.reserved[(kind, key)]
+        rows = self.run(self.select_fresh, kind, key, count + len(reserved), default=[])
+        items = []
+        for row_id, digest, item in rows:
+            if digest in reserved:
+                continue
+            reserved[digest] = row_id
+            items.append(json.loads(item))
+            if len(items) == count:
+                break
+        return items
+
+    def select_fresh(self, db, kind, key, limit):
+        return db.execute(
+            "SELECT id, digest, item FROM content WHERE kind = ? AND key = ? AND serves < ? AND (served_at IS NULL OR served_at < ?) "
+            "ORDER BY serves, created DESC LIMIT ?",
+            (kind, key, self.max_serves, time.time() - self.repeat_after, limit)
+        ).fetchall()
+
+    def add(self, kind, key, items):
+        rows = [(kind, key, content_digest(item), json.dumps(item), time.time()) for item in items]
+        ids = self.run(self.insert_items, rows, default={})
+        self.reserved[(kind, key)].update(ids)
+
+    def insert_items(self, db, rows):
+        db.executemany("INSERT OR IGNORE INTO content (kind, key, digest, item, created) VALUES (?, ?, ?, ?, ?)", rows)
+        excess = db.execute("SELECT COUNT(*) FROM content").fetchone()[0] - self.max_items
+        if excess > 0:
+            # Most-served first, then oldest
+            db.execute("DELETE FROM content WHERE id IN (SELECT id FROM content ORDER BY serves DESC, created LIMIT ?)", (excess,))
+        db.commit()
+        digests = [row[2] for row in rows]
+        found = db.execute(
+            f"SELECT digest, id FROM content WHERE kind = ? AND key = ? AND digest IN ({','.join('?' * len(digests))})",
+            (rows[0][0], rows[0][1], *digests)
+        ).fetchall() if rows else []
+        return dict(found)
+
+    def mark_served(self, kind, key, items):
+        reserved = self.reserved[(kind, key)]
+        ids = [reserved.pop(digest) for digest in map(content_digest, items) if digest in reserved]
+        if ids:
+            self.run(self.update_served, ids)
+
+    def update_served(self, db, ids):
+        marks = ",".join("?" * len(ids))
+        db.execute(f"UPDATE content SET serves = serves + 1, served_at = ? WHERE id IN ({marks})", (time.time(), *ids))
+        db.execute("DELETE FROM content WHERE serves >= ?", (self.max_serves,))
+        db.commit()
+
+    def get_verdicts(self, keys):
+        if not keys:
+            return {}
+        return self.run(self.select_verdicts, keys, default={})
+
+    def select_verdicts(self, db, keys):
+        cutoff = time.time() - self.verdict_ttl
+        verdicts = {}
+        for key in keys:
+            row = db.execute(
+                "SELECT verdict FROM verdicts WHERE word = ? AND category = ? AND letter = ? AND stored_at >= ?",
+                (*key, cutoff)
+            ).fetchone()
+            if row:
+                verdicts[key] = bool(row[0])
+        return verdicts
+
+    def put_verdicts(self, verdicts):
+        if verdicts:
+            self.run(self.insert_verdicts, [(*key, int(verdict), time.time()) for key, verdict in verdicts.items()])
+
+    def insert_verdicts(self, db, rows):
+        db.executemany("INSERT OR REPLACE INTO verdicts (word, category, letter, verdict, stored_at) VALUES (?, ?, ?, ?, ?)", rows)
+        excess = db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.max_verdicts
+        if excess > 0:
+            db.execute("DELETE FROM verdicts WHERE rowid IN (SELECT rowid FROM verdicts ORDER BY stored_at LIMIT ?)", (excess,))
+        db.commit()
+
+class ContentPool:
+    """Pre-generated content per key, refilled in the background between watermarks.
+
+    A refill takes unserved items from the store first and calls produce for
+    the rest; a take that finds the queue empty gets fallback items instead.
+    """
+
+    def __init__(self, name, keys, produce, fallback, store, low_watermark, high_watermark, batch_size, units=None):
+        self.name = name
+        self.queues = {key: deque() for key in keys}
+        # Items consumed per take for each key; watermarks are scaled by it
+        self.units = units or {}
+        self.produce = produce
+        self.fallback = fallback
+        self.store = store
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.batch_size = batch_size
+        self.refilling = set()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "refills": 0,
+            "refill_failures": 0,
+            "store_items": 0,
+            "refill_seconds_total": 0.0,
+            "refill_seconds_last": 0.0
+        }
+
+    def take(self, key):
+        return self.take_many(key, 1)[0]
+
+    def take_many(self, key, count):
+        queue = self.queues[key]
+        items = [queue.popleft() for _ in range(min(count, len(queue)))]
+        self.stats["hits"] += len(items)
+        if items:
+            eventlet.spawn_n(self.store.mark_served, self.name, key, list(items))
+        if len(items) < count:
+            self.stats["misses"] += count - len(items)
+            items.extend(self.fallback(key, count - len(items)))
+        if len(queue) < self.low_watermark * self.units.get(key, 1):
+            self.request_refill(key)
+        return items
+
+    def request_refill(self, key):
+        if key in self.refilling:
+            return
+        self.refilling.add(key)
+        eventlet.spawn_n(self.refill, key)
+
+    def refill(self, key):
+        queue = self.queues[key]
+        high = self.high_watermark * self.units.get(key, 1)
+        try:
+            while len(queue) < high:
+                started = time.time()
+                wanted = min(self.batch_size, high - len(queue))
+                # Unserved content from the on-disk store first, Gemini for the rest
+                items = self.store.take(self.name, key, wanted)
+                self.stats["store_items"] += len(items)
+                if len(items) < wanted:
+                    try:
+                        generated = self.produce(key, wanted - len(items))
+                    except Exception as e:
+                        self.stats["refill_failures"] += 1
+                        logger.error(f"Gemini {self.name} pool refill for {key} failed: {str(e)}")
+                        queue.extend(items)
+                        return
+                    self.store.add(self.name, key, generated)
+                    items.extend(generated)
+                elapsed = time.time() - started
+                self.stats["refills"] += 1
+                self.stats["refill_seconds_total"] += elapsed
+                self.stats["refill_seconds_last"] = elapsed
+                if not items:
+                    return
+                queue.extend(items)
+        finally:
+            self.refilling.discard(key)
+
+    def snapshot(self):
+        refills = self.stats["refills"]
+        return {
+            **self.stats,
+            "refill_seconds_avg": self.stats["refill_seconds_total"] / refills if refills else 0.0,
+            "refilling": sorted(self.refilling),
+            "sizes": {key: len(queue) for key, queue in self.queues.items()}
+        }
@@ -0,0 +1,176 @@
+"""Local crash recovery for one worker: a journal of game changes plus periodic snapshots.
+
+A directory holds snapshot.json and journal-<n>.jsonl segments. Every save or
+delete is one JSON line; restore loads the snapshot and replays the segments
+written after it.
+"""
+import os
+import time
+import logging
+import eventlet
+import orjson
+from eventlet import tpool
+from eventlet.queue import LightQueue, Empty
+
+logger = logging.getLogger(__name__)
+
+class NullGameJournal:
+    stats = {}
+
+    def restore(self):
+        return {}
+
+    def start(self):
+        pass
+
+    def save(self, game_id, game):
+        pass
+
+    def delete(self, game_id):
+        pass
+
+class GameJournal:
+    """Append-only journal of game changes plus periodic snapshots, on local disk.
+
+    save_game and delete_game queue one whole-game record each; a writer
+    greenlet appends them to journal-<n>.jsonl through tpool, so the event
+    loop only pays for orjson. Every interval the snapshot greenlet starts a
+    new segment, serializes the games a chunk at a time (yielding between
+    chunks) and has the writer swap snapshot.json in and drop older segments.
+    Restore loads the snapshot and replays the segments after it; a record
+    already reflected in the snapshot just writes the same game again.
+    """
+
+    def __init__(self, directory, interval, games, chunk=500):
+        self.directory = directory
+        self.interval = interval
+        self.games = games  # game_id -> game, the dict that snapshots are taken of
+        self.chunk = chunk  # Games serialized between yields to the event loop
+        self.segment = 0
+        self.records = LightQueue()  # bytes, ("rotate", n) or ("snapshot", n, parts)
+        self.dirty = False
+        self.stats = {"records": 0, "snapshots": 0, "snapshot_games": 0, "snapshot_seconds_last": 0.0,
+                      "restored_games": 0, "restore_seconds": 0.0, "write_failures": 0}
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def segments(self):
+        names = [name for name in os.listdir(self.directory) if name.startswith("journal-") and name.endswith(".jsonl")]
+        return sorted(int(name[len("journal-"):-len(".jsonl")]) for name in names)
+
+    def restore(self):
+        os.makedirs(self.directory, exist_ok=True)
+        restored, first = {}, 0
+        try:
+            with open(self.path("snapshot.json"), "rb") as f:
+                snapshot = orjson.loads(f.read())
+            restored, first = snapshot["games"], snapshot["segment"]
+        except FileNotFoundError:
+            pass
+        segments = [segment for segment in self.segments() if segment >= first]
+        for segment in segments:
+            with open(self.path(f"journal-{segment:08d}.jsonl"), "rb") as f:
+                for line in f:
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        logger.warning(f"Skipping a torn record in journal segment {segment}")
+                        continue
+                    if record["op"] == "save":
+                        restored[record["id"]] = record["game"]
+                    else:
+                        restored.pop(record["id"], None)
+        # Never append to a segment that may end in a torn line
+        self.segment = max(segments, default=first) + 1
+        # Queued first, so saves and deletes made while the caller installs these games land in the new segment
+        self.records.put(("rotate", self.segment))
+        return restored
+
+    def start(self):
+        eventlet.spawn_n(self.write)
+        eventlet.spawn_n(self.snapshot_loop)
+
+    def save(self, game_id, game):
+        self.records.put(orjson.dumps({"op": "save", "id": game_id, "game": game}, option=orjson.OPT_NON_STR_KEYS) + b"\n")
+        self.dirty = True
+
+    def delete(self, game_id):
+        self.records.put(orjson.dumps({"op": "delete", "id": game_id}) + b"\n")
+        self.dirty = True
+
+    def write(self):
+        journal = None
+        while True:
+            batch = [self.records.get()]
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except Empty:
+                    break
+            lines = []
+            for item in batch + [None]:
+                if isinstance(item, bytes):
+                    lines.append(item)
+                    continue
+                try:
+                    if lines:
+                        tpool.execute(self.append, journal, lines)
+                        self.stats["records"] += len(lines)
+                    lines = []
+                    if item is None:
+                        continue
+                    if item[0] == "rotate":
+                        if journal:
+                            tpool.execute(journal.close)
+                        journal = open(self.path(f"journal-{item[1]:08d}.jsonl"), "ab")
+                    else:
+                        tpool.execute(self.write_snapshot, *item[1:])
+                        self.stats["snapshots"] += 1
+                except Exception as e:
+                    lines = []
+                    self.stats["write_failures"] += 1
+                    logger.error(f"Game journal write failed: {str(e)}")
+
+    @staticmethod
+    def append(journal, lines):
+        journal.writelines(lines)
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    def write_snapshot(self, segment, parts):
+        temp = self.path("snapshot.json.tmp")
+        with open(temp, "wb") as f:
+            f.write(b'{"segment":%d,"games":{' % segment)
+            f.write(b",".join(parts))
+            f.write(b"}}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path("snapshot.json"))
+        for old in self.segments():
+            if old < segment:
+                os.remove(self.path(f"journal-{old:08d}.jsonl"))
+
+    def snapshot_loop(self):
+        while True:
+            eventlet.sleep(self.interval)
+            if not self.dirty:
+                continue
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Game snapshot failed: {str(e)}")
+
+    def snapshot(self):
+        started = time.monotonic()
+        self.dirty = False
+        # Changes from here on land in the new segment, which restore replays over this snapshot
+        self.segment += 1
+        self.records.put(("rotate", self.segment))
+        parts = []
+        for i, (game_id, game) in enumerate(list(self.games.items()), 1):
+            parts.append(orjson.dumps(game_id) + b":" + orjson.dumps(game, option=orjson.OPT_NON_STR_KEYS))
+            if i % self.chunk == 0:
+                eventlet.sleep(0)
+        self.records.put(("snapshot", self.segment, parts))
+        self.stats.update(snapshot_games=len(parts), snapshot_seconds_last=round(time.monotonic() - started, 3))
@@ -0,0 +1,104 @@
+"""Cross-game team and player standings, served at /leaderboard.
+
+Scoring paths record points as they are awarded, so the board never scans
+running games and outlives the ones that have ended. Under cluster.py one
+worker keeps the board and the others publish their points to it.
+"""
+import time
+import logging
+from bisect import insort
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class TopK:
+    """Running totals by name plus the k highest, kept sorted.
+
+    Totals only grow, so a name outside the top k can only get in by beating
+    the current k-th entry; each add is O(k) and never rescans the totals.
+    At most `candidates` names are tracked: past that, the lower half is
+    forgotten and a forgotten name that scores again starts from zero.
+    """
+
+    def __init__(self, k, candidates=None):
+        self.k = k
+        self.candidates = max(candidates or 100 * k, 2 * k)
+        self.totals = {}  # name -> total points
+        self.top = []  # (-total, name), best first
+        self.members = set()  # names in top
+
+    def add(self, name, points):
+        old = self.totals.get(name, 0)
+        total = self.totals[name] = old + points
+        entry = (-total, name)
+        if name in self.members:
+            self.top.remove((-old, name))
+        elif len(self.top) >= self.k:
+            if entry >= self.top[-1]:
+                return
+            self.members.discard(self.top.pop()[1])
+        insort(self.top, entry)
+        self.members.add(name)
+        if len(self.totals) > self.candidates:
+            self.prune()
+
+    def prune(self):
+        # Same order as top, so the top k are always among the names kept
+        ranked = sorted(self.totals.items(), key=lambda item: (-item[1], item[0]))
+        self.totals = dict(ranked[:self.candidates // 2])
+
+    def entries(self):
+        return [{"name": name, "score": -total} for total, name in self.top]
+
+class Leaderboard:
+    """Team and player points across every game, from every worker.
+
+    Scoring paths call record() as points are awarded, so the board outlives
+    the games. The JSON body is built at most once per version; the ETag
+    pairs the version with a per-process epoch so a restart can't reuse one.
+
+    On a worker given publish, record() hands the points to publish instead,
+    and the worker that keeps the board applies them in follow().
+    """
+
+    def __init__(self, size, worker=0, publish=None):
+        self.teams = TopK(size)
+        self.players = TopK(size)
+        self.version = 0
+        self.epoch = f"{worker}.{int(time.time())}"
+        self.body = None
+        self.publish = publish
+
+    def record(self, team, player, points):
+        if points <= 0:
+            return
+        if self.publish:
+            self.publish({"team": team, "player": player, "points": points})
+            return
+        if team:
+            self.teams.add(team, points)
+        if player:
+            self.players.add(player, points)
+        self.version += 1
+        self.body = None
+
+    def follow(self, messages):
+        # Runs for good in a background task on the worker that keeps the board
+        for message in messages:
+            try:
+                score = orjson.loads(message)
+                self.record(score["team"], score["player"], score["points"])
+            except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                logger.warning(f"Skipping a malformed leaderboard score: {str(e)}")
+
+    def etag(self):
+        return f"{self.epoch}.{self.version}"
+
+    def render(self):
+        if self.body is None:
+            self.body = orjson.dumps({
+                "version": self.version,
+                "teams": self.teams.entries(),
+                "players": self.players.entries()
+            })
+        return self.body
@@ -4,31 +4,481 @@ import random
 import string
 import time
 import json
-from datetime import datetime
-from collections import defaultdict
-from flask import Flask, render_template, request, session, jsonify
+import copy
+import sys
+import hashlib
+import gc
+import mimetypes
+from array import array
+from datetime import datetime, timezone
+from collections import defaultdict, deque, OrderedDict
+from functools import wraps
+from logging.handlers import QueueHandler
+from flask import Flask, render_template, request, session, jsonify, Response, has_request_context, url_for
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.exceptions import BadRequest, NotFound
-import google.generativeai as genai
+from eventlet import tpool, Timeout
+from eventlet.patcher import original
+from eventlet.semaphore import Semaphore
+from eventlet.queue import LightQueue, Empty
+import eventlet
+import orjson
+from socketio.packet import Packet, EVENT, BINARY_EVENT
+from socketio.msgpack_packet import MsgPackPacket
+from cluster import BrokerClient, LocalBrokerManager, LEADERBOARD_WORKER, subscribe, worker_for_game
+from metrics import Registry
+from assets import CachedAsset
+from content import NullContentStore, ContentStore, ContentPool
+from journal import NullGameJournal, GameJournal
+from leaderboard import Leaderboard
+from ratelimit import RateLimiter
+from spectators import SpectatorFeed
+from timers import TimerWheel
+
+original_queue = original("queue")
+original_threading = original("threading")
 
 # Initialize Flask app
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "super-secret-key-12345")
 app.config["SESSION_TYPE"] = "filesystem"
-socketio = SocketIO(app, async_mode="eventlet", logger=True, engineio_logger=True)
+
+# Multi-worker setup (see cluster.py): each worker owns the games whose ID
+# hashes to its index, and emits reach other workers through MESSAGE_QUEUE.
+WORKER_INDEX = int(os.environ.get("WORKER_INDEX", 0))
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT", 1))
+MESSAGE_QUEUE = os.environ.get("MESSAGE_QUEUE")
+STATE_STORE = os.environ.get("STATE_STORE")
+# Local crash recovery: a journal of game changes plus periodic snapshots
+GAME_JOURNAL = os.environ.get("GAME_JOURNAL", "game_journal")  # Directory; empty to disable
+GAME_SNAPSHOT_INTERVAL = int(os.environ.get("GAME_SNAPSHOT_INTERVAL", 60))
+GAME_SNAPSHOT_CHUNK = 500  # Games serialized between yields to the event loop
+# Instrumentation, exposed at /metrics
+metrics = Registry()
+event_seconds = metrics.histogram("socketio_event_seconds", "Time spent in each Socket.IO event handler", ["event"])
+event_exceptions = metrics.counter("socketio_event_exceptions_total", "Socket.IO handlers that raised", ["event"])
+emit_recipients = metrics.histogram("socketio_emit_recipients", "Clients on this worker reached by each emit", ["event"], buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256))
+emit_bytes = metrics.histogram("socketio_emit_payload_bytes", "Encoded size of each emitted event, measured once per emit", ["event"], buckets=(64, 256, 1024, 4096, 16384, 65536))
+events_throttled = metrics.counter("socketio_events_throttled_total", "Socket.IO events dropped by the per-connection rate limit", ["event"])
+gemini_seconds = metrics.histogram("gemini_call_seconds", "Gemini calls by helper; outcome is fallback when the call failed and the caller fell back, queued when it never got a slot before its deadline", ["helper", "outcome"])
+
+def games_by_phase():
+    counts = defaultdict(int)
+    for game in games.values():
+        counts[game["phase"]] += 1
+    return [((phase,), count) for phase, count in counts.items()]
+
+metrics.gauge("games_active", "Games held by this worker", games_by_phase, ["phase"])
+metrics.gauge("players_connected", "Sockets joined to a game on this worker", lambda: len(players.sessions))
+metrics.gauge("spectators_connected", "Sockets watching a game on this worker", lambda: len(spectators.sessions))
+metrics.gauge("players_joined", "Players on a roster in this worker's games", lambda: sum(players.counts.values()))
+
+# Wire format
+# Socket.IO's manager encodes a room emit once and hands the same packet to every
+# recipient, so the encoder runs once per broadcast. orjson makes that one pass
+# cheaper; SOCKETIO_SERIALIZER=msgpack switches to the msgpack parser, which the
+# client in templates/index.html picks up from the page.
+SOCKETIO_SERIALIZER = os.environ.get("SOCKETIO_SERIALIZER", "json")
+
+class OrjsonCodec:
+    """json-module stand-in for Socket.IO and Engine.IO packets, backed by orjson."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            # orjson is stricter (e.g. non-string keys); keep the old behaviour for those
+            return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(data, **kwargs):
+        return orjson.loads(data)
+
+def metered_packet_class(base):
+    """Packet class that records each event's encoded size from the one encode Socket.IO does."""
+    class MeteredPacket(base):
+        def encode(self):
+            encoded = super().encode()
+            if self.packet_type in (EVENT, BINARY_EVENT):
+                size = sum(map(len, encoded)) if isinstance(encoded, list) else len(encoded)
+                emit_bytes.labels(self.data[0]).observe(size)
+            return encoded
+    return MeteredPacket
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO that records the fan-out of every emit, including flask_socketio.emit.
+
+    Payload sizes are recorded by MeteredPacket as the packet is encoded.
+    """
+
+    def emit(self, event, *args, **kwargs):
+        try:
+            rooms = self.server.manager.rooms.get(kwargs.get("namespace") or "/", {})
+            members = rooms.get(kwargs.get("to") or kwargs.get("room"), ())
+            skip = kwargs.get("skip_sid")
+            skipped = sum(1 for sid in (skip if isinstance(skip, list) else [skip]) if sid in members)
+            emit_recipients.labels(event).observe(len(members) - skipped)
+        except Exception as e:
+            logger.warning(f"Emit metrics for {event} failed: {str(e)}")
+        return super().emit(event, *args, **kwargs)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# LOG_FORMAT=json hands records to a writer thread through a bounded queue and
+# samples high-frequency events, so handlers never wait on stdout.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.01))
+LOG_SAMPLED_EVENTS = {"drawing", "drawing_update", "pictionary_guess", "packet"}
+LOG_QUEUE_SIZE = 10000
+log_dropped = metrics.counter("log_records_dropped_total", "Log records not written", ["reason"])
+
+class EventContextFilter(logging.Filter):
+    """Tags records with the Socket.IO event and game they belong to, unless passed in `extra`."""
+
+    def filter(self, record):
+        if not hasattr(record, "event"):
+            record.event = None
+            if record.name.startswith("engineio"):
+                record.event = "packet"
+            elif record.name.startswith("socketio") and str(record.msg).startswith(("received event", "emitting event")):
+                record.event = record.args[0]
+            elif has_request_context():
+                record.event = getattr(request, "event", {}).get("message")
+        if not hasattr(record, "game_id"):
+            record.game_id = session.get("game_id") if has_request_context() else None
+        return True
+
+class EventSampler(logging.Filter):
+    """Keeps one in 1/rate records for high-frequency events; warnings and everything else pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or record.event not in LOG_SAMPLED_EVENTS or random.random() < self.rate:
+            return True
+        log_dropped.labels("sampled").inc()
+        return False
+
+class DroppingQueueHandler(QueueHandler):
+    tracebacks = logging.Formatter()
+
+    def prepare(self, record):
+        # The base class folds the traceback into msg and clears exc_text;
+        # keep it apart so JsonFormatter can write it to "exc"
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.tracebacks.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except original_queue.Full:
+            log_dropped.labels("queue_full").inc()
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "event": getattr(record, "event", None),
+            "game_id": getattr(record, "game_id", None),
+            "worker": WORKER_INDEX
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def write_log_records(records, handler):
+    while True:
+        handler.handle(records.get())
+
+def configure_logging():
+    if LOG_FORMAT != "json":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+        return
+    # A real OS thread and queue even when eventlet has patched the stdlib,
+    # so a slow stdout stalls the writer instead of the hub.
+    records = original_queue.Queue(LOG_QUEUE_SIZE)
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(EventContextFilter())
+    handler.addFilter(EventSampler(LOG_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    original_threading.Thread(target=write_log_records, args=(records, writer), name="log-writer", daemon=True).start()
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
+socketio_options = {}
+if LOG_FORMAT == "json":
+    # Loggers rather than True, or Socket.IO attaches its own synchronous stderr handlers
+    socketio_options.update(logger=logging.getLogger("socketio.server"), engineio_logger=logging.getLogger("engineio.server"))
+else:
+    socketio_options.update(logger=True, engineio_logger=True)
+if MESSAGE_QUEUE and MESSAGE_QUEUE.startswith("local://"):
+    socketio_options["client_manager"] = LocalBrokerManager(MESSAGE_QUEUE)
+elif MESSAGE_QUEUE:
+    socketio_options["message_queue"] = MESSAGE_QUEUE
+if SOCKETIO_SERIALIZER == "msgpack":
+    socketio_options["serializer"] = metered_packet_class(MsgPackPacket)
+else:
+    socketio_options.update(serializer=metered_packet_class(Packet), json=OrjsonCodec)
+socketio = InstrumentedSocketIO(app, async_mode="eventlet", **socketio_options)
+
+def socket_event(event, control=None):
+    """socketio.on plus a rate limit, a latency histogram and an exception count for the handler.
+
+    control, if given, is called with the event's arguments; the events it
+    picks out are charged to a separate "<event>_control" limit, so a flood
+    of ordinary events can't crowd them out.
+    """
+    def decorator(handler):
+        latency = event_seconds.labels(event)
+        exceptions = event_exceptions.labels(event)
+        # Flask-SocketIO retries connect/disconnect handlers on TypeError to
+        # probe their signature; pass only what the handler takes instead.
+        arity = handler.__code__.co_argcount
+        limits = {}  # bucket -> (rate, throttled counter)
+        for bucket in [event, f"{event}_control"] if control else [event]:
+            rate = 0 if bucket in UNLIMITED_EVENTS else EVENT_RATE_LIMITS.get(bucket, RATE_LIMIT_DEFAULT)
+            limits[bucket] = (rate, events_throttled.labels(bucket) if rate else None)
+        @wraps(handler)
+        def wrapper(*args):
+            bucket = f"{event}_control" if control and control(*args) else event
+            rate, throttled = limits[bucket]
+            # Dropped before the handler runs, so a flood never reaches game state
+            if rate and not rate_limiter.allow(request.sid, bucket, rate, 2 * rate):
+                throttled.inc()
+                return None
+            started = time.perf_counter()
+            try:
+                return handler(*args[:arity])
+            except Exception:
+                exceptions.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+        return socketio.on(event)(wrapper)
+    return decorator
+
 # Gemini API setup
+# The SDK (grpc, protobuf) is most of this module's import time, so it is only
+# loaded by the first Gemini call; benchmarks and tests assign a stub instead.
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "your-gemini-api-key-here")
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_client = genai.GenerativeModel("gemini-2.0-flash")  # Adjust model as needed
+gemini_client = None
+gemini_client_lock = original_threading.Lock()  # Taken in tpool threads
+GEMINI_WORKERS = int(os.environ.get("GEMINI_WORKERS", 8))
+GEMINI_DEADLINE = float(os.environ.get("GEMINI_DEADLINE", 4.0))
+GEMINI_BREAKER_FAILURES = int(os.environ.get("GEMINI_BREAKER_FAILURES", 5))  # Consecutive failures that open the breaker
+GEMINI_BREAKER_RESET = float(os.environ.get("GEMINI_BREAKER_RESET", 30.0))  # Seconds open before a probe call
+GEMINI_HEDGE = os.environ.get("GEMINI_HEDGE") == "1"  # Send a duplicate request once the first passes the p95
+GEMINI_HEDGE_MIN_SAMPLES = 20
+gemini_slots = Semaphore(GEMINI_WORKERS)
+
+def get_gemini_client():
+    global gemini_client
+    with gemini_client_lock:
+        if gemini_client is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            gemini_client = genai.GenerativeModel("gemini-2.0-flash")  # Adjust model as needed
+    return gemini_client
+
+def gemini_generate_content(prompt):
+    # Runs in a tpool thread, so the one-off SDK import never stalls the event loop
+    return get_gemini_client().generate_content(prompt)
 
 # Game state storage
+class PlayerRegistry:
+    """Connected users and game membership, indexed so handlers never scan.
+
+    games[game_id]["teams"] stays the ordered roster; every membership change
+    goes through add_member/remove_member so the indexes stay in step with it.
+    """
+
+    def __init__(self):
+        self.sessions = {}  # sid -> {"game_id", "team", "name", "role"}
+        self.sids = {}  # (game_id, name) -> sid
+        self.members = {}  # (game_id, name) -> {"team", "role"}
+        self.teams = defaultdict(set)  # (game_id, team) -> member names
+        self.counts = defaultdict(int)  # game_id -> members across all teams
+        self.departed = {}  # game_id -> {name: role} for members a disconnect took off the roster
+
+    def add_member(self, game_id, team, name, role):
+        self.departed.get(game_id, {}).pop(name, None)
+        games[game_id]["teams"].setdefault(team, []).append({"name": name, "role": role})
+        self.members[(game_id, name)] = {"team": team, "role": role}
+        self.teams[(game_id, team)].add(name)
+        self.counts[game_id] += 1
+
+    def remove_member(self, game_id, name):
+        member = self.members.pop((game_id, name), None)
+        if not member:
+            return None
+        team = member["team"]
+        self.departed.setdefault(game_id, {})[name] = member["role"]
+        teams = games[game_id]["teams"]
+        teams[team] = [p for p in teams[team] if p["name"] != name]
+        names = self.teams[(game_id, team)]
+        names.discard(name)
+        if not names:
+            del self.teams[(game_id, team)]
+            del teams[team]
+            games[game_id]["scores"].setdefault(team, 0)  # Marks the team as rejoinable
+        self.counts[game_id] -= 1
+        return team
+
+    def drop_game(self, game_id):
+        for team, roster in games[game_id]["teams"].items():
+            for p in roster:
+                self.members.pop((game_id, p["name"]), None)
+                self.sids.pop((game_id, p["name"]), None)
+            self.teams.pop((game_id, team), None)
+        self.counts.pop(game_id, None)
+        self.departed.pop(game_id, None)
+
+    def connect(self, sid, game_id, name):
+        # The session mirrors the roster, whatever team the client claims
+        member = self.members[(game_id, name)]
+        self.sessions[sid] = {"game_id": game_id, "team": member["team"], "name": name, "role": member["role"]}
+        self.sids[(game_id, name)] = sid
+
+    def disconnect(self, sid):
+        # Returns the session and whether this sid was still the name's live socket;
+        # after a reconnect the old socket's disconnect arrives late and changes nothing
+        user = self.sessions.pop(sid, None)
+        live = bool(user) and self.sids.get((user["game_id"], user["name"])) == sid
+        if live:
+            del self.sids[(user["game_id"], user["name"])]
+        return user, live
+
+    def get(self, sid):
+        return self.sessions.get(sid)
+
+    def sid_of(self, game_id, name):
+        return self.sids.get((game_id, name))
+
+    def team_of(self, game_id, name):
+        member = self.members.get((game_id, name))
+        return member["team"] if member else None
+
+    def role_of(self, game_id, name):
+        member = self.members.get((game_id, name))
+        return member["role"] if member else None
+
+    def rejoin_role(self, game_id, name):
+        return self.departed.get(game_id, {}).get(name, "player")
+
+    def count(self, game_id):
+        return self.counts.get(game_id, 0)
+
+    def index_game(self, game_id):
+        # Rebuild membership indexes for a game restored from the shared store
+        for team, roster in games[game_id]["teams"].items():
+            for p in roster:
+                self.members[(game_id, p["name"])] = {"team": team, "role": p["role"]}
+                self.teams[(game_id, team)].add(p["name"])
+                self.counts[game_id] += 1
+
+class MemoryGameStore:
+    """Games live only in this worker's memory; the default for a single worker."""
+
+    def save(self, game_id, game):
+        pass
+
+    def load(self, game_id):
+        return None
+
+    def delete(self, game_id):
+        pass
+
+class SharedGameStore:
+    """Write-through copy of each game in a store every worker can reach.
+
+    Live games still run in the owning worker's memory. The shared copy, saved
+    at roster changes and phase boundaries, lets a restarted or resized worker
+    pick a game back up by ID.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend  # Anything with get/set/delete, e.g. redis.Redis or BrokerClient
+
+    def save(self, game_id, game):
+        self.backend.set(f"game:{game_id}", json.dumps(game))
+
+    def load(self, game_id):
+        raw = self.backend.get(f"game:{game_id}")
+        return json.loads(raw) if raw else None
+
+    def delete(self, game_id):
+        self.backend.delete(f"game:{game_id}")
+
+def create_game_store(url):
+    if not url:
+        return MemoryGameStore()
+    if url.startswith("local://"):
+        return SharedGameStore(BrokerClient(url))
+    import redis
+    return SharedGameStore(redis.Redis.from_url(url))
+
+class GameActivity:
+    """Last player activity per game, least recently active first.
+
+    The order doubles as the LRU list, so the idle reaper and the game cap only
+    ever look at the front.
+    """
+
+    def __init__(self):
+        self.last_seen = OrderedDict()  # game_id -> time.monotonic() of the last player action
+        self.evictions = defaultdict(int)  # reason -> games evicted
+
+    def touch(self, game_id):
+        self.last_seen[game_id] = time.monotonic()
+        self.last_seen.move_to_end(game_id)
+
+    def forget(self, game_id):
+        self.last_seen.pop(game_id, None)
+
+    def oldest(self):
+        return next(iter(self.last_seen), None)
+
+    def idle(self, ttl):
+        cutoff = time.monotonic() - ttl
+        expired = []
+        for game_id, seen in self.last_seen.items():
+            if seen > cutoff:
+                break
+            expired.append(game_id)
+        return expired
+
+    def idle_seconds(self, game_id):
+        seen = self.last_seen.get(game_id)
+        return time.monotonic() - seen if seen is not None else None
+
 games = {}
-users = {}
+players = PlayerRegistry()
+game_activity = GameActivity()
+game_store = create_game_store(STATE_STORE)
+
+def create_game_journal(directory):
+    if not directory:
+        return NullGameJournal()
+    if WORKER_COUNT > 1:
+        directory = os.path.join(directory, f"worker-{WORKER_INDEX}")
+    return GameJournal(directory, GAME_SNAPSHOT_INTERVAL, games, GAME_SNAPSHOT_CHUNK)
+
+game_journal = create_game_journal(GAME_JOURNAL)
 
 # Static game data (supplemented by Gemini)
 TRIVIA_CATEGORIES = ["Geography", "Science", "Art", "Math", "Space"]
@@ -40,81 +490,898 @@ SCATTERGORIES_CATEGORIES = [
 ]
 CAH_STATIC_PROMPTS = ["In retrospect, ___ was a terrible idea."]
 CAH_STATIC_CARDS = ["a screaming toddler", "too much coffee", "a rogue clown"]
+CAH_HAND_SIZE = 7
+POOL_LOW_WATERMARK = int(os.environ.get("POOL_LOW_WATERMARK", 3))
+POOL_HIGH_WATERMARK = int(os.environ.get("POOL_HIGH_WATERMARK", 12))
+POOL_BATCH_SIZE = int(os.environ.get("POOL_BATCH_SIZE", 10))
+CONTENT_WARMUP_DELAY = float(os.environ.get("CONTENT_WARMUP_DELAY", 2.0))  # Seconds after startup before pools fill
+SCATTERGORIES_CACHE_SIZE = int(os.environ.get("SCATTERGORIES_CACHE_SIZE", 5000))
+SCATTERGORIES_CACHE_TTL = int(os.environ.get("SCATTERGORIES_CACHE_TTL", 86400))
+CONTENT_STORE_PATH = os.environ.get("CONTENT_STORE", "content_store.sqlite3")  # Empty to disable
+CONTENT_STORE_MAX_ITEMS = int(os.environ.get("CONTENT_STORE_MAX_ITEMS", 20000))
+CONTENT_STORE_MAX_VERDICTS = int(os.environ.get("CONTENT_STORE_MAX_VERDICTS", 100000))
+CONTENT_REPEAT_AFTER = int(os.environ.get("CONTENT_REPEAT_AFTER", 6 * 3600))  # Seconds before an item may be shown again
+CONTENT_MAX_SERVES = int(os.environ.get("CONTENT_MAX_SERVES", 3))  # Items are retired after this many games
+DRAWING_TICK_HZ = float(os.environ.get("DRAWING_TICK_HZ", 30))
+DRAWING_SIMPLIFY_PX = int(os.environ.get("DRAWING_SIMPLIFY_PX", 2))
+DRAWING_MAX_COORD = 4095
+DRAWING_HISTORY_MAX = int(os.environ.get("DRAWING_HISTORY_MAX", 65536))  # int16 values kept per game
+TIMER_TICK_SECONDS = float(os.environ.get("TIMER_TICK_SECONDS", 0.5))
+TIMER_WHEEL_SLOTS = 256
+ROUND_GRACE_SECONDS = 2  # Allowance for client latency past the advertised time limit
+CAH_VOTE_SECONDS = 30
+LOBBY_COALESCE_SECONDS = float(os.environ.get("LOBBY_COALESCE_SECONDS", 0.1))
+GUESS_COALESCE_SECONDS = float(os.environ.get("GUESS_COALESCE_SECONDS", 0.25))  # Minimum gap between wrong-guess broadcasts
+# Per-connection token buckets: events per second, with a burst of two seconds' worth; 0 disables
+RATE_LIMIT_DRAWING = float(os.environ.get("RATE_LIMIT_DRAWING", 120))
+RATE_LIMIT_DRAWING_CONTROL = float(os.environ.get("RATE_LIMIT_DRAWING_CONTROL", 10))
+RATE_LIMIT_GUESS = float(os.environ.get("RATE_LIMIT_GUESS", 4))
+RATE_LIMIT_BUZZ = float(os.environ.get("RATE_LIMIT_BUZZ", 2))
+RATE_LIMIT_DEFAULT = float(os.environ.get("RATE_LIMIT_DEFAULT", 5))
+EVENT_RATE_LIMITS = {"drawing": RATE_LIMIT_DRAWING, "drawing_control": RATE_LIMIT_DRAWING_CONTROL, "pictionary_guess": RATE_LIMIT_GUESS, "buzz": RATE_LIMIT_BUZZ}
+UNLIMITED_EVENTS = {"connect", "disconnect"}
+SPECTATOR_INTERVAL = float(os.environ.get("SPECTATOR_INTERVAL", 0.5))  # Seconds between spectator updates
+SPECTATOR_MAX_PER_GAME = int(os.environ.get("SPECTATOR_MAX_PER_GAME", 1000))
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 50))
+GAME_IDLE_TTL = int(os.environ.get("GAME_IDLE_TTL", 1800))
+MAX_GAMES = int(os.environ.get("MAX_GAMES", 1000))
+GAME_REAP_INTERVAL = 30
 
 # Utility functions
 def generate_game_id():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    # Only hand out IDs this worker owns so the router sends the game back here
+    while True:
+        game_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        if game_id not in games and worker_for_game(game_id, WORKER_COUNT) == WORKER_INDEX:
+            return game_id
+
+# The stats endpoints are public and a game ID is all it takes to join or
+# watch a game, so they list games under a keyed hash, stable per process
+STATS_ID_KEY = os.urandom(16)
+
+def stats_id(game_id):
+    return hashlib.blake2s(game_id.encode(), key=STATS_ID_KEY, digest_size=6).hexdigest()
 
 def validate_input(data, required_fields):
     missing = [field for field in required_fields if field not in data or not data[field]]
     if missing:
         raise BadRequest(f"Missing required fields: {', '.join(missing)}")
 
-def get_game_or_404(game_id):
+def get_game_or_404(game_id, touch=True):
+    # Timer-driven paths pass touch=False so a game nobody plays still goes idle
+    if game_id and game_id not in games:
+        adopt_game(game_id)
     if not game_id or game_id not in games:
         raise NotFound("Game not found")
+    if touch:
+        game_activity.touch(game_id)
     return games[game_id]
 
-# Gemini API integration
-def generate_trivia_question(category):
+def save_game(game_id):
+    game_journal.save(game_id, games[game_id])
     try:
-        prompt = f"Generate a trivia question and answer for the category '{category}'. Format as JSON: {{'q': 'question', 'a': 'answer'}}"
-        response = gemini_client.generate_content(prompt)
-        data = json.loads(response.text)
-        return {"q": data["q"], "a": data["a"], "category": category}
+        game_store.save(game_id, games[game_id])
     except Exception as e:
-        logger.error(f"Gemini trivia generation failed: {str(e)}")
-        return {"q": f"What is a fact about {category}?", "a": "Ask again later", "category": category}
+        logger.error(f"Saving game {game_id} to the shared store failed: {str(e)}")
 
-def generate_pictionary_word(difficulty):
+def adopt_game(game_id):
+    if worker_for_game(game_id, WORKER_COUNT) != WORKER_INDEX:
+        return
     try:
-        prompt = f"Generate a single noun suitable for Pictionary with {difficulty} difficulty."
-        response = gemini_client.generate_content(prompt)
-        return response.text.strip()
+        game = game_store.load(game_id)
     except Exception as e:
-        logger.error(f"Gemini Pictionary word generation failed: {str(e)}")
-        return random.choice(["cat", "house", "tree"])
+        logger.error(f"Loading game {game_id} from the shared store failed: {str(e)}")
+        return
+    if not game:
+        return
+    install_game(game_id, game)
+    logger.info(f"Game {game_id} restored from the shared store", extra={"event": "game_restored", "game_id": game_id})
+
+def install_game(game_id, game):
+    # Put a game loaded from the shared store or the journal back in play
+    game["scores"] = defaultdict(int, game["scores"])
+    game.setdefault("roster_version", 0)
+    make_room_for_game()
+    games[game_id] = game
+    game_activity.touch(game_id)
+    players.index_game(game_id)
+    if game["phase"] == "loading":
+        load_phase(game_id, game["data"]["next_phase"])
+    elif game["phase"] in PHASE_BUILDERS:
+        arm_round_deadline(game_id)
 
-def generate_pictionary_hint(word):
+def make_room_for_game():
+    while len(games) >= MAX_GAMES and game_activity.oldest():
+        evict_game(game_activity.oldest(), "capacity")
+
+def delete_game(game_id, reason="ended"):
+    players.drop_game(game_id)
+    drawing_pipeline.discard(game_id)
+    round_timers.cancel(game_id)
+    lobby.discard(game_id)
+    guess_broadcaster.discard(game_id)
+    spectators.discard(game_id, reason)
+    game_activity.forget(game_id)
+    del games[game_id]
+    game_journal.delete(game_id)
     try:
-        prompt = f"Provide a subtle hint for drawing '{word}' in Pictionary without saying the word."
-        response = gemini_client.generate_content(prompt)
-        return response.text.strip()
+        game_store.delete(game_id)
     except Exception as e:
-        logger.error(f"Gemini Pictionary hint generation failed: {str(e)}")
-        return "Think about its shape."
+        logger.error(f"Deleting game {game_id} from the shared store failed: {str(e)}")
+    logger.info(f"Game {game_id} deleted", extra={"event": "game_deleted", "game_id": game_id})
+
+def evict_game(game_id, reason):
+    socketio.emit("game_closed", {"reason": reason}, room=game_id)
+    socketio.close_room(game_id)
+    delete_game(game_id, reason)
+    game_activity.evictions[reason] += 1
+    logger.info(f"Game {game_id} evicted ({reason})", extra={"event": "game_evicted", "game_id": game_id})
+
+def reap_idle_games():
+    while True:
+        socketio.sleep(GAME_REAP_INTERVAL)
+        for game_id in game_activity.idle(GAME_IDLE_TTL):
+            try:
+                evict_game(game_id, "idle")
+            except Exception as e:
+                logger.error(f"Evicting game {game_id} failed: {str(e)}")
 
-def validate_scattergories_word(word, category, letter):
+def approximate_size(obj, seen=None):
+    # sys.getsizeof of a container counts only its pointers, so walk the contents
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    return size
+
+# Gemini API integration
+class GeminiTimeout(Exception):
+    pass
+
+class GeminiUnavailable(Exception):
+    pass
+
+class CircuitBreaker:
+    """Stops calling a failing dependency, then lets one probe call through every reset_seconds."""
+
+    STATES = ("closed", "open", "half_open")
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened_total = 0
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def cancel(self):
+        # The allowed call never reached the dependency, so it proves nothing either way
+        self.probing = False
+
+    def record(self, ok):
+        self.probing = False
+        if ok:
+            if self.state != "closed":
+                logger.info("Gemini circuit breaker closed")
+            self.state = "closed"
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opened_total += 1
+                logger.warning(f"Gemini circuit breaker opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+gemini_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET)
+gemini_latencies = deque(maxlen=200)  # Recent successful call durations, for the hedge threshold
+gemini_short_circuits = metrics.counter("gemini_short_circuits_total", "Gemini calls skipped because the breaker was open").labels()
+gemini_hedges = metrics.counter("gemini_hedges_total", "Duplicate Gemini requests sent after the first passed the p95").labels()
+gemini_hedge_wins = metrics.counter("gemini_hedge_wins_total", "Hedged Gemini requests that answered first").labels()
+metrics.gauge("gemini_breaker_state", "1 for the Gemini circuit breaker's current state", lambda: [((state,), int(state == gemini_breaker.state)) for state in CircuitBreaker.STATES], ["state"])
+metrics.gauge("gemini_in_flight", "Gemini requests holding a concurrency slot", lambda: GEMINI_WORKERS - gemini_slots.balance)
+
+def gemini_p95():
+    if len(gemini_latencies) < GEMINI_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(gemini_latencies)
+    return ordered[int(0.95 * (len(ordered) - 1))]
+
+def gemini_request(prompt, attempt, results, call):
+    # A request waits for a slot only until its caller's deadline and is dropped
+    # if the caller has given up by then, so abandoned work never reaches the
+    # API. Once started, the slot is held until the SDK returns.
+    if not gemini_slots.acquire(timeout=max(0.0, call["deadline"] - time.monotonic())):
+        return
     try:
-        prompt = f"Is '{word}' a valid entry for the Scattergories category '{category}' starting with '{letter}'? Respond with 'yes' or 'no'."
-        response = gemini_client.generate_content(prompt)
-        return response.text.strip().lower() == "yes"
-    except Exception as e:
-        logger.error(f"Gemini Scattergories validation failed: {str(e)}")
-        return word.startswith(letter.lower())  # Fallback
+        if call["abandoned"]:
+            return
+        call["started"] = True
+        try:
+            results.put((attempt, True, tpool.execute(gemini_generate_content, prompt)))
+        except Exception as e:
+            results.put((attempt, False, e))
+    finally:
+        gemini_slots.release()
 
-def generate_cah_prompt():
+def gemini_generate(prompt, helper, deadline=GEMINI_DEADLINE):
+    # The SDK blocks on network I/O, so run it on eventlet's OS thread pool and
+    # cap concurrent calls; the waiting greenlet yields to the hub meanwhile.
+    # Every caller falls back to static content or a local check on failure.
+    if not gemini_breaker.allow():
+        gemini_short_circuits.inc()
+        raise GeminiUnavailable("Gemini circuit breaker is open")
+    started = time.perf_counter()
+    outcome = "fallback"
+    call = {"deadline": time.monotonic() + deadline, "started": False, "abandoned": False}
     try:
-        prompt = "Generate a funny Cards Against Humanity prompt with one blank (___). Keep it party-friendly."
-        response = gemini_client.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        logger.error(f"Gemini CAH prompt generation failed: {str(e)}")
-        return random.choice(CAH_STATIC_PROMPTS)
+        with Timeout(deadline, GeminiTimeout(f"Gemini call exceeded {deadline}s deadline")):
+            results = LightQueue()
+            eventlet.spawn_n(gemini_request, prompt, 0, results, call)
+            pending = 1
+            hedge_after = gemini_p95() if GEMINI_HEDGE else None
+            error = None
+            while pending:
+                try:
+                    attempt, ok, value = results.get(timeout=hedge_after)
+                except Empty:
+                    hedge_after = None
+                    if gemini_slots.balance > 0:  # Never queue a hedge behind other games' calls
+                        gemini_hedges.inc()
+                        eventlet.spawn_n(gemini_request, prompt, 1, results, call)
+                        pending += 1
+                    continue
+                pending -= 1
+                if ok:
+                    if attempt:
+                        gemini_hedge_wins.inc()
+                    break
+                error = value
+            else:
+                raise error
+        gemini_latencies.append(time.perf_counter() - started)
+        gemini_breaker.record(True)
+        outcome = "success"
+        return value
+    except Exception:
+        if call["started"]:
+            gemini_breaker.record(False)
+        else:
+            # Timed out waiting for a slot: local queueing, not a Gemini failure
+            outcome = "queued"
+            gemini_breaker.cancel()
+        raise
+    finally:
+        call["abandoned"] = True
+        gemini_seconds.labels(helper, outcome).observe(time.perf_counter() - started)
+
+def parse_json_list(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    data = json.loads(text)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array")
+    return data
+
+def parse_lines(text, count):
+    return [line.strip().lstrip("-*0123456789. ").strip() for line in text.strip().split("\n") if line.strip()][:count]
+
+def generate_trivia_questions(category, count):
+    prompt = f"Generate {count} different trivia questions with short answers for the category '{category}'. Format as a JSON array: [{{\"q\": \"question\", \"a\": \"answer\"}}]"
+    response = gemini_generate(prompt, "generate_trivia_questions")
+    return [{"q": item["q"], "a": item["a"], "category": category} for item in parse_json_list(response.text)[:count]]
+
+def generate_pictionary_pairs(difficulty, count):
+    prompt = f"Generate {count} different single nouns suitable for Pictionary with {difficulty} difficulty, each with a subtle hint for drawing it that doesn't say the word. Format as a JSON array: [{{\"word\": \"noun\", \"hint\": \"hint\"}}]"
+    response = gemini_generate(prompt, "generate_pictionary_pairs")
+    return [{"word": item["word"].strip(), "hint": item["hint"].strip()} for item in parse_json_list(response.text)[:count]]
+
+def generate_cah_prompts(count):
+    prompt = f"Generate {count} funny Cards Against Humanity prompts, each with one blank (___), one per line. Keep them party-friendly."
+    response = gemini_generate(prompt, "generate_cah_prompts")
+    return [line for line in parse_lines(response.text, count) if "___" in line]
+
+def generate_cah_cards(count):
+    prompt = f"Generate {count} funny, party-friendly Cards Against Humanity response cards, one per line."
+    response = gemini_generate(prompt, "generate_cah_cards")
+    return parse_lines(response.text, count)
+
+def generate_cah_content(kind, count):
+    return generate_cah_prompts(count) if kind == "prompts" else generate_cah_cards(count)
+
+class VerdictCache:
+    """Bounded LRU cache of Scattergories verdicts that also expires entries after a TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        verdict, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return verdict
+
+    def put(self, key, verdict):
+        self.entries[key] = (verdict, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+scattergories_cache = VerdictCache(SCATTERGORIES_CACHE_SIZE, SCATTERGORIES_CACHE_TTL)
+scattergories_stats = {
+    "rounds": 0,
+    "words": 0,
+    "cache_hits": 0,
+    "store_hits": 0,
+    "gemini_batches": 0,
+    "fallbacks": 0,
+    "call_seconds_ewma": 0.0,
+    "saved_seconds_total": 0.0,
+    "last_round": {}
+}
+
+def scattergories_key(word, category, letter):
+    return word.strip().lower(), category.lower(), letter.lower()
+
+def validate_scattergories_words(entries, letter):
+    """Judge a round's (word, category) entries with at most one Gemini request.
+
+    Returns verdicts keyed by scattergories_key. Cached verdicts are reused and
+    words that don't start with the letter are rejected without asking Gemini.
+    """
+    started = time.time()
+    verdicts = {}
+    pending = []
+    for word, category in entries:
+        key = scattergories_key(word, category, letter)
+        if key in verdicts:
+            continue
+        if not key[0].startswith(key[2]):
+            verdicts[key] = False
+            continue
+        cached = scattergories_cache.get(key)
+        if cached is None:
+            pending.append(key)
+            verdicts[key] = None
+        else:
+            verdicts[key] = cached
+            scattergories_stats["cache_hits"] += 1
+
+    stored = content_store.get_verdicts(pending)
+    for key, verdict in stored.items():
+        verdicts[key] = verdict
+        scattergories_cache.put(key, verdict)
+        scattergories_stats["store_hits"] += 1
+    pending = [key for key in pending if key not in stored]
+
+    batch_seconds = 0.0
+    if pending:
+        try:
+            lines = "\n".join(f"{i + 1}. {category}: {word}" for i, (word, category, _) in enumerate(pending))
+            prompt = f"You are judging Scattergories answers for the letter '{letter}'. For each numbered entry below (category: answer), decide whether the answer is a valid entry for that category starting with '{letter}'. Respond only with a JSON array of {len(pending)} booleans in the same order.\n{lines}"
+            response = gemini_generate(prompt, "validate_scattergories_words")
+            results = parse_json_list(response.text)
+            if len(results) != len(pending):
+                raise ValueError(f"Expected {len(pending)} verdicts, got {len(results)}")
+            batch_seconds = time.time() - started
+            scattergories_stats["gemini_batches"] += 1
+            ewma = scattergories_stats["call_seconds_ewma"]
+            scattergories_stats["call_seconds_ewma"] = batch_seconds if not ewma else 0.8 * ewma + 0.2 * batch_seconds
+            for key, verdict in zip(pending, results):
+                verdicts[key] = verdict is True or str(verdict).strip().lower() in ("true", "yes")
+                scattergories_cache.put(key, verdicts[key])
+            content_store.put_verdicts({key: verdicts[key] for key in pending})
+        except Exception as e:
+            logger.error(f"Gemini Scattergories validation failed: {str(e)}")
+            scattergories_stats["fallbacks"] += 1
+            for key in pending:
+                verdicts[key] = True  # Fallback: the letter check above already passed
+
+    # Unbatched, every entry cost its own round-trip; estimate that from the
+    # running per-call latency to report what batching and caching saved.
+    elapsed = time.time() - started
+    estimated_serial = len(entries) * scattergories_stats["call_seconds_ewma"]
+    scattergories_stats["rounds"] += 1
+    scattergories_stats["words"] += len(entries)
+    scattergories_stats["saved_seconds_total"] += max(estimated_serial - elapsed, 0.0)
+    scattergories_stats["last_round"] = {
+        "words": len(entries),
+        "gemini_judged": len(pending),
+        "seconds": elapsed,
+        "estimated_serial_seconds": estimated_serial
+    }
+    return verdicts
+
+# Static fallbacks, served when a pool runs dry
+def fallback_trivia_questions(category, count):
+    return [{"q": f"What is a fact about {category}?", "a": "Ask again later", "category": category}] * count
+
+def fallback_pictionary_pairs(difficulty, count):
+    return [{"word": random.choice(["cat", "house", "tree"]), "hint": "Think about its shape."} for _ in range(count)]
+
+def fallback_cah_content(kind, count):
+    if kind == "prompts":
+        return [random.choice(CAH_STATIC_PROMPTS) for _ in range(count)]
+    return random.sample(CAH_STATIC_CARDS, min(count, len(CAH_STATIC_CARDS)))
+
+# Content store
+def create_content_store(path):
+    if not path:
+        return NullContentStore()
+    return ContentStore(path, CONTENT_STORE_MAX_ITEMS, CONTENT_STORE_MAX_VERDICTS,
+                        CONTENT_REPEAT_AFTER, CONTENT_MAX_SERVES, SCATTERGORIES_CACHE_TTL)
+
+content_store = create_content_store(CONTENT_STORE_PATH)
+
+# Content pools
+def content_pool(name, keys, produce, fallback, units=None):
+    return ContentPool(name, keys, produce, fallback, content_store,
+                       POOL_LOW_WATERMARK, POOL_HIGH_WATERMARK, POOL_BATCH_SIZE, units)
 
-def generate_cah_cards(count=5):
+trivia_pool = content_pool("trivia", TRIVIA_CATEGORIES, generate_trivia_questions, fallback_trivia_questions)
+pictionary_pool = content_pool("pictionary", PICTIONARY_DIFFICULTIES, generate_pictionary_pairs, fallback_pictionary_pairs)
+cah_pool = content_pool("cah", ["prompts", "cards"], generate_cah_content, fallback_cah_content, units={"cards": CAH_HAND_SIZE})
+CONTENT_POOLS = [trivia_pool, pictionary_pool, cah_pool]
+
+def warm_content_pools():
+    # Let the server start answering before the first refill pulls in the Gemini SDK
+    socketio.sleep(CONTENT_WARMUP_DELAY)
+    for pool in CONTENT_POOLS:
+        for key in pool.queues:
+            pool.request_refill(key)
+
+# Pictionary drawing pipeline
+def simplify_points(points, tolerance=DRAWING_SIMPLIFY_PX):
+    # Radial-distance simplification: drop points closer than the tolerance to
+    # the last kept point, but always keep the segment's endpoints.
+    if tolerance <= 0 or len(points) <= 2:
+        return points
+    limit = tolerance * tolerance
+    kept = [points[0]]
+    for x, y in points[1:-1]:
+        kx, ky = kept[-1]
+        if (x - kx) * (x - kx) + (y - ky) * (y - ky) >= limit:
+            kept.append((x, y))
+    kept.append(points[-1])
+    return kept
+
+def encode_segment(frame, new_stroke, points):
+    """Append one stroke segment to an int16 frame.
+
+    A segment is a signed point count followed by the first point and then
+    per-point deltas. A positive count starts a new stroke, a negative count
+    continues the previous one, and a lone zero count clears the canvas.
+    """
+    points = simplify_points(points)
+    frame.append(len(points) if new_stroke else -len(points))
+    px, py = points[0]
+    frame.extend((px, py))
+    for x, y in points[1:]:
+        frame.extend((x - px, y - py))
+        px, py = x, y
+
+def frame_bytes(frame):
+    if sys.byteorder == "big":
+        frame = array("h", frame)
+        frame.byteswap()
+    return frame.tobytes()
+
+def trim_history(history, limit):
+    # Drop whole segments from the front until the buffer fits, then turn a
+    # leading continuation into a stroke start so the snapshot still decodes.
+    i = 0
+    while len(history) - i > limit:
+        i += 1 + 2 * abs(history[i])
+    del history[:i]
+    if history and history[0] < 0:
+        history[0] = -history[0]
+
+class DrawingPipeline:
+    """Buffers the drawer's points per game and flushes them as one binary frame per tick."""
+
+    def __init__(self):
+        self.pending = {}  # game_id -> {"sid": drawer sid, "ops": [[new_stroke, points] or None for clear]}
+        self.history = {}  # game_id -> array("h") of every segment since the last clear
+        self.running = False
+
+    def entry(self, game_id, sid):
+        entry = self.pending.get(game_id)
+        if entry is None:
+            entry = self.pending[game_id] = {"sid": sid, "ops": []}
+            self.ensure_running()
+        return entry
+
+    def add_point(self, game_id, sid, x, y, start):
+        ops = self.entry(game_id, sid)["ops"]
+        if start or not ops or ops[-1] is None:
+            ops.append([start, [(x, y)]])
+        else:
+            ops[-1][1].append((x, y))
+
+    def clear(self, game_id, sid):
+        self.entry(game_id, sid)["ops"].append(None)
+
+    def discard(self, game_id):
+        self.pending.pop(game_id, None)
+        self.history.pop(game_id, None)
+
+    def snapshot(self, game_id):
+        history = self.history.get(game_id)
+        return frame_bytes(history) if history else None
+
+    def memory_usage(self):
+        return {game_id: sys.getsizeof(history) for game_id, history in self.history.items()}
+
+    def ensure_running(self):
+        if not self.running:
+            self.running = True
+            socketio.start_background_task(self.run)
+
+    def run(self):
+        interval = 1.0 / DRAWING_TICK_HZ
+        while True:
+            socketio.sleep(interval)
+            if not self.pending:
+                continue
+            pending, self.pending = self.pending, {}
+            for game_id, entry in pending.items():
+                try:
+                    self.flush(game_id, entry)
+                except Exception as e:
+                    logger.error(f"Drawing flush for game {game_id} failed: {str(e)}")
+
+    def flush(self, game_id, entry):
+        frame = array("h")
+        history = self.history.setdefault(game_id, array("h"))
+        for op in entry["ops"]:
+            if op is None:
+                frame.append(0)
+                del history[:]
+            else:
+                start = len(frame)
+                encode_segment(frame, *op)
+                history.extend(frame[start:])
+        if len(history) > DRAWING_HISTORY_MAX:
+            trim_history(history, DRAWING_HISTORY_MAX * 3 // 4)
+        data = frame_bytes(frame)
+        socketio.emit("drawing_update", {"frame": data}, room=game_id, skip_sid=entry["sid"])
+        spectators.drew(game_id, games[game_id]["round"], data)
+
+drawing_pipeline = DrawingPipeline()
+
+# Round deadlines
+round_timers = TimerWheel(TIMER_TICK_SECONDS, TIMER_WHEEL_SLOTS)
+
+# Lobby roster broadcasts
+class LobbyBroadcaster:
+    """Versioned roster updates: small join/leave deltas, coalesced over a short window.
+
+    games[game_id]["roster_version"] goes up by one per membership change. A
+    delta carries the version it applies on top of, so a client that missed
+    one asks for the snapshot, which is built once per version and reused.
+    A joiner whose snapshot is newer than a delta's base skips the changes
+    it already has instead.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.pending = {}  # game_id -> {"base": version before the first change, "changes": [...]}
+        self.snapshots = {}  # game_id -> snapshot payload for the current version
+
+    def changed(self, game_id, op, team, name):
+        game = games[game_id]
+        entry = self.pending.get(game_id)
+        if entry is None:
+            entry = self.pending[game_id] = {"base": game["roster_version"], "changes": []}
+            socketio.start_background_task(self.flush_later, game_id)
+        game["roster_version"] += 1
+        entry["changes"].append({"op": op, "team": team, "name": name})
+        self.snapshots.pop(game_id, None)
+
+    def snapshot(self, game_id):
+        snapshot = self.snapshots.get(game_id)
+        if snapshot is None:
+            game = games[game_id]
+            snapshot = self.snapshots[game_id] = {
+                "version": game["roster_version"],
+                "teams": {team: [p["name"] for p in roster] for team, roster in game["teams"].items()}
+            }
+        return snapshot
+
+    def flush_later(self, game_id):
+        socketio.sleep(self.window)
+        entry = self.pending.pop(game_id, None)
+        if not entry or game_id not in games:
+            return
+        if len(entry["changes"]) > players.count(game_id):
+            # Heavy churn: the whole roster is smaller than the list of changes
+            socketio.emit("lobby_snapshot", self.snapshot(game_id), room=game_id)
+        else:
+            socketio.emit("lobby_delta", {
+                "base": entry["base"],
+                "version": games[game_id]["roster_version"],
+                "changes": entry["changes"]
+            }, room=game_id)
+
+    def discard(self, game_id):
+        self.pending.pop(game_id, None)
+        self.snapshots.pop(game_id, None)
+
+lobby = LobbyBroadcaster(LOBBY_COALESCE_SECONDS)
+
+# Pictionary guess broadcasts
+class GuessBroadcaster:
+    """Sends wrong guesses as batches, at most one pictionary_guess per game per window.
+
+    A guess after a quiet spell goes out at once; guesses that arrive within
+    the window of the last broadcast wait for its end and share one emit, so
+    a burst of guesses costs the room one broadcast instead of one each.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.pending = {}  # game_id -> [{"user", "guess"}, ...] waiting for the window to close
+        self.sent = {}  # game_id -> monotonic time of the last broadcast
+
+    def add(self, game_id, user, guess):
+        batch = self.pending.get(game_id)
+        if batch is not None:
+            batch.append({"user": user, "guess": guess})
+            return
+        wait = self.sent.get(game_id, 0.0) + self.window - time.monotonic()
+        if wait <= 0:
+            self.send(game_id, [{"user": user, "guess": guess}])
+        else:
+            batch = self.pending[game_id] = [{"user": user, "guess": guess}]
+            socketio.start_background_task(self.flush_later, game_id, batch, wait)
+
+    def send(self, game_id, batch):
+        self.sent[game_id] = time.monotonic()
+        socketio.emit("pictionary_guess", {"guesses": batch}, room=game_id)
+
+    def flush(self, game_id):
+        # Ahead of a result, so the room sees the wrong guesses first
+        batch = self.pending.pop(game_id, None)
+        if batch:
+            self.send(game_id, batch)
+
+    def flush_later(self, game_id, batch, wait):
+        socketio.sleep(wait)
+        if self.pending.get(game_id) is not batch:
+            return  # Already flushed
+        del self.pending[game_id]
+        game = games.get(game_id)
+        if game and game["phase"] == "pictionary":
+            self.send(game_id, batch)
+
+    def discard(self, game_id):
+        self.pending.pop(game_id, None)
+        self.sent.pop(game_id, None)
+
+guess_broadcaster = GuessBroadcaster(GUESS_COALESCE_SECONDS)
+
+# Spectators
+def public_round(game):
+    # What an audience may see of the current round: no answers, words or hands
+    data = game["data"]
+    phase = game["phase"]
+    if phase == "loading":
+        return {"next_phase": data["next_phase"]}
+    if phase == "trivia":
+        return {"question": data["question"]["q"], "category": data["question"]["category"], "buzz": data["buzz"]}
+    if phase == "pictionary":
+        return {"drawer": data.get("drawer"), "hint": data.get("hint"), "guesses": len(data.get("guesses", ()))}
+    if phase == "scattergories":
+        return {"letter": data["letter"], "categories": data["categories"], "submitted": len(data["submissions"])}
+    if phase == "cah":
+        return {"prompt": data["prompt"], "judge": data["judge"], "submitted": len(data["submissions"])}
+    return {}
+
+def spectator_state(game_id):
+    game = games.get(game_id)
+    if game is None:
+        return None
+    return {
+        "phase": game["phase"],
+        "round": game["round"],
+        "scores": dict(game["scores"]),
+        "teams": lobby.snapshot(game_id)["teams"],
+        "detail": public_round(game)
+    }
+
+# A stroke backlog longer than the drawing history (two bytes per value) is sent as a snapshot instead
+spectators = SpectatorFeed(socketio, SPECTATOR_INTERVAL, SPECTATOR_MAX_PER_GAME, spectator_state,
+                           drawing_pipeline.snapshot, DRAWING_HISTORY_MAX * 2)
+
+# Flood control
+rate_limiter = RateLimiter()
+
+# Leaderboard
+# Under cluster.py the router sends /leaderboard to LEADERBOARD_WORKER, and the
+# other workers publish their points to it over MESSAGE_QUEUE.
+LEADERBOARD_CHANNEL = "leaderboard"
+
+class BrokerScoreFeed:
+    """Leaderboard points over the local broker that cluster.py runs."""
+
+    def __init__(self, url):
+        self.url = url
+        self.client = BrokerClient(url)
+
+    def publish(self, score):
+        self.client.publish(LEADERBOARD_CHANNEL, score)
+
+    def messages(self):
+        return subscribe(self.url, LEADERBOARD_CHANNEL)
+
+class RedisScoreFeed:
+    """Leaderboard points over Redis pub/sub."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, score):
+        self.client.publish(LEADERBOARD_CHANNEL, orjson.dumps(score))
+
+    def messages(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(LEADERBOARD_CHANNEL)
+        for message in pubsub.listen():
+            yield message["data"]
+
+def create_score_feed(url):
+    if WORKER_COUNT < 2 or not url:
+        return None
+    if url.startswith("local://"):
+        return BrokerScoreFeed(url)
+    return RedisScoreFeed(url)
+
+def publish_score(score):
     try:
-        prompt = f"Generate {count} funny, party-friendly Cards Against Humanity response cards, one per line."
-        response = gemini_client.generate_content(prompt)
-        return response.text.strip().split("\n")[:count]
+        score_feed.publish(score)
     except Exception as e:
-        logger.error(f"Gemini CAH cards generation failed: {str(e)}")
-        return random.sample(CAH_STATIC_CARDS, min(count, len(CAH_STATIC_CARDS)))
+        logger.error(f"Publishing a leaderboard score failed: {str(e)}")
+
+score_feed = create_score_feed(MESSAGE_QUEUE)
+if score_feed and WORKER_INDEX != LEADERBOARD_WORKER:
+    leaderboard = Leaderboard(LEADERBOARD_SIZE, WORKER_INDEX, publish_score)
+else:
+    leaderboard = Leaderboard(LEADERBOARD_SIZE, WORKER_INDEX)
+
+# Page and static assets
+# The page is rendered once at startup and every body is compressed once, so
+# a page load costs the socket worker a dict lookup and a write.
+PAGE_ASSETS = ["app.css", "app.js"]
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def load_assets():
+    assets = {}
+    for name in PAGE_ASSETS:
+        with open(os.path.join(app.static_folder, name), "rb") as f:
+            assets[name] = CachedAsset(f.read(), mimetypes.guess_type(name)[0])
+    return assets
+
+def asset_url(name):
+    # The content hash in the URL is what lets browsers cache assets for a year
+    return url_for("static", filename=name, v=static_assets[name].version)
+
+def render_index():
+    with app.test_request_context():
+        html = render_template("index.html", socketio_serializer=SOCKETIO_SERIALIZER, asset_url=asset_url)
+    return CachedAsset(html.encode(), "text/html")
+
+def serve_static(filename):
+    asset = static_assets.get(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+    return asset.response(ASSET_CACHE_CONTROL if request.args.get("v") == asset.version else "no-cache")
+
+static_assets = load_assets()
+index_page = render_index()
+app.view_functions["static"] = serve_static
 
 # Routes
 @app.route("/")
 def index():
-    return render_template("index.html")
+    # Revalidated on every load, so a deploy's new asset URLs are picked up; unchanged pages get a 304
+    return index_page.response("no-cache")
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/gemini_stats")
+def gemini_stats():
+    p95 = gemini_p95()
+    return jsonify({
+        "breaker": {
+            "state": gemini_breaker.state,
+            "consecutive_failures": gemini_breaker.failures,
+            "opened_total": gemini_breaker.opened_total
+        },
+        "in_flight": GEMINI_WORKERS - gemini_slots.balance,
+        "max_concurrency": GEMINI_WORKERS,
+        "deadline_seconds": GEMINI_DEADLINE,
+        "hedging": GEMINI_HEDGE,
+        "p95_seconds": p95,
+        "short_circuits": gemini_short_circuits.value,
+        "hedges": gemini_hedges.value,
+        "hedge_wins": gemini_hedge_wins.value
+    })
+
+@app.route("/pool_stats")
+def pool_stats():
+    return jsonify({pool.name: pool.snapshot() for pool in CONTENT_POOLS})
+
+@app.route("/drawing_stats")
+def drawing_stats():
+    usage = drawing_pipeline.memory_usage()
+    return jsonify({"games": {stats_id(game_id): size for game_id, size in usage.items()}, "total_bytes": sum(usage.values())})
+
+@app.route("/validation_stats")
+def validation_stats():
+    return jsonify({**scattergories_stats, "cache_size": len(scattergories_cache.entries)})
+
+@app.route("/game_stats")
+def game_stats():
+    drawing = drawing_pipeline.memory_usage()
+    stats = {}
+    for game_id, game in games.items():
+        idle = game_activity.idle_seconds(game_id)
+        stats[stats_id(game_id)] = {
+            "phase": game["phase"],
+            "players": players.count(game_id),
+            "spectators": spectators.watchers.get(game_id, 0),
+            "idle_seconds": round(idle, 1) if idle is not None else None,
+            "bytes": approximate_size(game) + drawing.get(game_id, 0)
+        }
+    return jsonify({
+        "games": stats,
+        "count": len(games),
+        "total_bytes": sum(s["bytes"] for s in stats.values()),
+        "max_games": MAX_GAMES,
+        "idle_ttl": GAME_IDLE_TTL,
+        "evictions": dict(game_activity.evictions),
+        "spectator_updates": spectators.updates,
+        "journal": game_journal.stats
+    })
+
+@app.route("/leaderboard")
+def leaderboard_endpoint():
+    # Pollers send If-None-Match and get a 304 until the next score lands
+    response = Response(leaderboard.render(), mimetype="application/json")
+    response.set_etag(leaderboard.etag())
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Leaderboard-Version"] = str(leaderboard.version)
+    return response.make_conditional(request)
 
 @app.route("/create_game", methods=["POST"])
 def create_game():
@@ -130,15 +1397,20 @@ def create_game():
 
         session["user_name"] = user_name
         session["game_id"] = game_id
+        make_room_for_game()
         games[game_id] = {
             "phase": "lobby",
-            "teams": {team_name: [{"name": user_name, "role": "leader"}]},
+            "teams": {},
             "scores": defaultdict(int),
             "data": {},
             "start_time": time.time(),
-            "round": 0
+            "round": 0,
+            "roster_version": 0
         }
-        logger.info(f"Game {game_id} created by {user_name}")
+        game_activity.touch(game_id)
+        players.add_member(game_id, team_name, user_name, "leader")
+        save_game(game_id)
+        logger.info(f"Game {game_id} created by {user_name}", extra={"event": "game_created", "game_id": game_id})
         return jsonify({"game_id": game_id, "team": team_name})
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
@@ -160,11 +1432,15 @@ def join_game():
             raise BadRequest("Game has already started")
         if not (2 <= len(team_name) <= 20 and 2 <= len(user_name) <= 20):
             raise BadRequest("Team and user names must be 2-20 characters")
+        if players.team_of(game_id, user_name):
+            raise BadRequest("That name is already taken in this game")
 
         session["user_name"] = user_name
         session["game_id"] = game_id
-        game["teams"].setdefault(team_name, []).append({"name": user_name, "role": "player"})
-        logger.info(f"{user_name} joined game {game_id}")
+        players.add_member(game_id, team_name, user_name, "player")
+        lobby.changed(game_id, "join", team_name, user_name)
+        save_game(game_id)
+        logger.info(f"{user_name} joined game {game_id}", extra={"event": "game_joined", "game_id": game_id})
         return jsonify({"game_id": game_id, "team": team_name})
     except (BadRequest, NotFound) as e:
         return jsonify({"error": str(e)}), 400 if isinstance(e, BadRequest) else 404
@@ -173,35 +1449,34 @@ def join_game():
         return jsonify({"error": "Internal server error"}), 500
 
 # SocketIO Events
-@socketio.on("connect")
+@socket_event("connect")
 def handle_connect():
     sid = request.sid
     logger.info(f"Client {sid} connected")
     emit("message", {"data": "Connected to Ultimate Party Challenge!", "timestamp": datetime.now().isoformat()})
 
-@socketio.on("disconnect")
+@socket_event("disconnect")
 def handle_disconnect():
     sid = request.sid
-    if sid in users:
-        user = users[sid]
+    rate_limiter.forget(sid)
+    if spectators.remove(sid):
+        logger.info(f"Spectator {sid} disconnected")
+        return
+    user, live = players.disconnect(sid)
+    if user:
         game_id = user["game_id"]
-        team = user["team"]
         name = user["name"]
-        if game_id in games:
-            team_data = next((t for t in games[game_id]["teams"][team] if t["name"] == name), None)
-            if team_data:
-                games[game_id]["teams"][team].remove(team_data)
-            if not games[game_id]["teams"][team]:
-                del games[game_id]["teams"][team]
+        if live and game_id in games:
+            team = players.remove_member(game_id, name)
             if not games[game_id]["teams"]:
-                del games[game_id]
-                logger.info(f"Game {game_id} deleted")
+                delete_game(game_id)
             else:
-                emit("update_lobby", {"teams": {k: [p["name"] for p in v] for k, v in games[game_id]["teams"].items()}}, room=game_id)
-        del users[sid]
+                if team:
+                    lobby.changed(game_id, "leave", team, name)
+                save_game(game_id)
         logger.info(f"Client {sid} ({name}) disconnected")
 
-@socketio.on("join")
+@socket_event("join")
 def handle_join(data):
     try:
         validate_input(data, ["team", "game_id", "user_name"])
@@ -209,51 +1484,75 @@ def handle_join(data):
         user_name = data["user_name"]
         team = data["team"]
         game = get_game_or_404(game_id)
-        if team not in game["teams"]:
+        current = players.team_of(game_id, user_name)
+        if current and current != team:
+            raise BadRequest(f"{user_name} is on team {current}")
+        # A team emptied by disconnects keeps its score and can be rejoined
+        if not current and team not in game["teams"] and team not in game["scores"]:
             raise BadRequest("Team not found")
         
         join_room(game_id)
-        users[request.sid] = {"game_id": game_id, "team": team, "name": user_name, "role": "player"}
-        emit("update_lobby", {"teams": {k: [p["name"] for p in v] for k, v in games[game_id]["teams"].items()}}, room=game_id)
+        if not current:
+            # Back after a disconnect took them off the roster, in the role they left with
+            players.add_member(game_id, team, user_name, players.rejoin_role(game_id, user_name))
+            lobby.changed(game_id, "join", team, user_name)
+            save_game(game_id)
+        players.connect(request.sid, game_id, user_name)
+        emit("lobby_snapshot", lobby.snapshot(game_id))
+        if game["phase"] == "pictionary":
+            snapshot = drawing_pipeline.snapshot(game_id)
+            if snapshot:
+                emit("drawing_snapshot", {"frame": snapshot})
         logger.info(f"{user_name} joined game {game_id} on team {team}")
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
-@socketio.on("start_game")
+@socket_event("spectate")
+def handle_spectate(data):
+    try:
+        validate_input(data, ["game_id"])
+        game_id = data["game_id"]
+        # Watching doesn't count as activity, so an abandoned game still goes idle
+        get_game_or_404(game_id, touch=False)
+        watched = spectators.remove(request.sid)
+        if watched:
+            leave_room(spectators.room(watched))
+        spectators.add(request.sid, game_id)
+        join_room(spectators.room(game_id))
+        emit("spectator_update", spectators.welcome(game_id))
+        logger.info(f"Spectator {request.sid} watching game {game_id}")
+    except (BadRequest, NotFound) as e:
+        emit("error", {"message": str(e)})
+
+@socket_event("lobby_sync")
+def handle_lobby_sync():
+    # A client that missed a delta asks for the full roster
+    user = players.get(request.sid)
+    if user and user["game_id"] in games:
+        emit("lobby_snapshot", lobby.snapshot(user["game_id"]))
+
+@socket_event("start_game")
 def start_game(data=None):
     try:
-        game_id = data.get("game_id") if data else users.get(request.sid, {}).get("game_id")
-        user_name = users.get(request.sid, {}).get("name")
+        user = players.get(request.sid) or {}
+        game_id = data.get("game_id") if data else user.get("game_id")
+        user_name = user.get("name")
         if not game_id or not user_name:
             raise BadRequest("Session not initialized")
         game = get_game_or_404(game_id)
         if game["phase"] != "lobby":
             raise BadRequest("Game already started")
-        if not any(p["name"] == user_name and p["role"] == "leader" for t in game["teams"].values() for p in t):
+        if players.role_of(game_id, user_name) != "leader":
             raise BadRequest("Only the leader can start")
         
-        game["phase"] = "trivia"
         game["round"] = 1
-        category = random.choice(TRIVIA_CATEGORIES)
-        question = generate_trivia_question(category)
-        game["data"] = {
-            "question": question,
-            "buzz": None,
-            "answers": {},
-            "time_limit": 30
-        }
-        emit("game_start", {
-            "phase": "trivia",
-            "question": question["q"],
-            "category": question["category"],
-            "time_limit": game["data"]["time_limit"]
-        }, room=game_id)
+        load_phase(game_id, "trivia", event="game_start")
         logger.info(f"Game {game_id} started")
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
 # Trivia Events
-@socketio.on("buzz")
+@socket_event("buzz")
 def handle_buzz():
     try:
         game_id = session.get("game_id")
@@ -269,7 +1568,7 @@ def handle_buzz():
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
-@socketio.on("trivia_answer")
+@socket_event("trivia_answer")
 def handle_trivia_answer(data):
     try:
         validate_input(data, ["answer"])
@@ -283,11 +1582,12 @@ def handle_trivia_answer(data):
         
         answer = data["answer"].strip().lower()
         correct_answer = game["data"]["question"]["a"].lower()
-        team = users[request.sid]["team"]
+        team = players.get(request.sid)["team"]
         game["data"]["answers"][user_name] = answer
         
         if answer == correct_answer:
             game["scores"][team] += 10
+            leaderboard.record(team, user_name, 10)
             emit("trivia_result", {
                 "user": user_name,
                 "correct": True,
@@ -306,7 +1606,7 @@ def handle_trivia_answer(data):
         emit("error", {"message": str(e)})
 
 # Pictionary Events
-@socketio.on("start_drawing")
+@socket_event("start_drawing")
 def handle_start_drawing(data):
     try:
         game_id = session.get("game_id")
@@ -317,45 +1617,66 @@ def handle_start_drawing(data):
         if game["phase"] != "pictionary" or "drawer" in game["data"]:
             return
         
-        team = users[request.sid]["team"]
-        if any(p["name"] == user_name for p in game["teams"][team]):
-            difficulty = random.choice(PICTIONARY_DIFFICULTIES)
-            word = generate_pictionary_word(difficulty)
-            hint = generate_pictionary_hint(word)
+        if players.team_of(game_id, user_name):
             game["data"]["drawer"] = user_name
-            game["data"]["word"] = word
-            game["data"]["hint"] = hint
-            game["data"]["guesses"] = {}
-            game["data"]["time_limit"] = 60
-            emit("pictionary_start", {
-                "drawer": user_name,
-                "word": word if user_name == session["user_name"] else "****",
-                "hint": hint,
-                "time_limit": game["data"]["time_limit"]
-            }, room=game_id)
+            round_no = game["round"]
+            emit("phase_loading", {"phase": "pictionary"}, room=game_id)
+            socketio.start_background_task(start_pictionary_round, game_id, round_no, user_name)
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
-@socketio.on("drawing")
+def start_pictionary_round(game_id, round_no, drawer):
+    difficulty = random.choice(PICTIONARY_DIFFICULTIES)
+    pair = pictionary_pool.take(difficulty)
+    word, hint = pair["word"], pair["hint"]
+    game = games.get(game_id)
+    if not game or game["phase"] != "pictionary" or game["round"] != round_no:
+        return
+    game["data"]["word"] = word
+    game["data"]["hint"] = hint
+    game["data"]["guesses"] = {}
+    game["data"]["time_limit"] = 60
+    arm_round_deadline(game_id)
+    start = {
+        "drawer": drawer,
+        "word": "****",
+        "hint": hint,
+        "time_limit": game["data"]["time_limit"]
+    }
+    # Only the drawer's socket is sent the word itself
+    drawer_sid = players.sid_of(game_id, drawer)
+    socketio.emit("pictionary_start", start, room=game_id, skip_sid=drawer_sid)
+    if drawer_sid:
+        socketio.emit("pictionary_start", dict(start, word=word), room=drawer_sid)
+
+def drawing_control(data):
+    # Stroke starts and clears get their own bucket: a burst of points must not
+    # drop one, which would merge two strokes or leave canvases out of sync
+    return isinstance(data, dict) and (bool(data.get("start")) or not data.get("drawing"))
+
+@socket_event("drawing", control=drawing_control)
 def handle_drawing(data):
     try:
-        validate_input(data, ["x", "y", "drawing"])
         game_id = session.get("game_id")
         if not game_id:
             raise BadRequest("Session not initialized")
         game = get_game_or_404(game_id)
-        if game["phase"] != "pictionary" or users[request.sid]["name"] != game["data"]["drawer"]:
+        if game["phase"] != "pictionary" or players.get(request.sid)["name"] != game["data"].get("drawer"):
             return
         
-        emit("drawing_update", {
-            "x": data["x"],
-            "y": data["y"],
-            "drawing": data["drawing"]
-        }, room=game_id, skip_sid=request.sid)
+        if not data.get("drawing"):
+            drawing_pipeline.clear(game_id, request.sid)
+            return
+        try:
+            x = min(max(int(data["x"]), 0), DRAWING_MAX_COORD)
+            y = min(max(int(data["y"]), 0), DRAWING_MAX_COORD)
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("Invalid drawing point")
+        drawing_pipeline.add_point(game_id, request.sid, x, y, bool(data.get("start")))
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
-@socketio.on("pictionary_guess")
+@socket_event("pictionary_guess")
 def handle_pictionary_guess(data):
     try:
         validate_input(data, ["guess"])
@@ -364,7 +1685,7 @@ def handle_pictionary_guess(data):
         if not game_id or not user_name:
             raise BadRequest("Session not initialized")
         game = get_game_or_404(game_id)
-        if game["phase"] != "pictionary" or user_name == game["data"]["drawer"]:
+        if game["phase"] != "pictionary" or "word" not in game["data"] or user_name == game["data"]["drawer"]:
             return
         
         guess = data["guess"].strip().lower()
@@ -372,8 +1693,10 @@ def handle_pictionary_guess(data):
         game["data"]["guesses"][user_name] = guess
         
         if guess == word:
-            team = users[request.sid]["team"]
+            team = players.get(request.sid)["team"]
             game["scores"][team] += 15
+            leaderboard.record(team, user_name, 15)
+            guess_broadcaster.flush(game_id)
             emit("pictionary_result", {
                 "user": user_name,
                 "correct": True,
@@ -382,12 +1705,12 @@ def handle_pictionary_guess(data):
             }, room=game_id)
             transition_phase(game_id, "scattergories")
         else:
-            emit("pictionary_guess", {"user": user_name, "guess": guess}, room=game_id)
+            guess_broadcaster.add(game_id, user_name, guess)
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
 # Scattergories Events
-@socketio.on("scattergories_submit")
+@socket_event("scattergories_submit")
 def handle_scattergories_submit(data):
     try:
         validate_input(data, ["words"])
@@ -396,21 +1719,21 @@ def handle_scattergories_submit(data):
         if not game_id or not user_name:
             raise BadRequest("Session not initialized")
         game = get_game_or_404(game_id)
-        if game["phase"] != "scattergories":
+        if game["phase"] != "scattergories" or game["data"].get("scoring"):
             return
         
         submissions = game["data"].setdefault("submissions", {})
         submissions[user_name] = [w.strip() for w in data["words"] if w.strip()]
         emit("submission_received", {"user": user_name}, room=game_id)
         
-        total_players = sum(len(t) for t in game["teams"].values())
+        total_players = players.count(game_id)
         if len(submissions) == total_players:
             score_scattergories(game_id)
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
 # Cards Against Humanity Events
-@socketio.on("cah_submit")
+@socket_event("cah_submit")
 def handle_cah_submit(data):
     try:
         validate_input(data, ["card"])
@@ -419,23 +1742,20 @@ def handle_cah_submit(data):
         if not game_id or not user_name:
             raise BadRequest("Session not initialized")
         game = get_game_or_404(game_id)
-        if game["phase"] != "cah" or user_name == game["data"]["judge"]:
+        if game["phase"] != "cah" or user_name == game["data"]["judge"] or game["data"].get("voting"):
             return
         
         submissions = game["data"].setdefault("submissions", {})
         submissions[user_name] = data["card"].strip()
         emit("submission_received", {"user": user_name}, room=game_id)
         
-        total_players = sum(len(t) for t in game["teams"].values()) - 1  # Exclude judge
+        total_players = players.count(game_id) - 1  # Exclude judge
         if len(submissions) == total_players:
-            emit("cah_voting", {
-                "prompt": game["data"]["prompt"],
-                "submissions": {k: v for k, v in submissions.items()}
-            }, room=game_id)
+            start_cah_voting(game_id)
     except (BadRequest, NotFound) as e:
         emit("error", {"message": str(e)})
 
-@socketio.on("cah_vote")
+@socket_event("cah_vote")
 def handle_cah_vote(data):
     try:
         validate_input(data, ["winner"])
@@ -451,8 +1771,10 @@ def handle_cah_vote(data):
         if winner not in game["data"]["submissions"]:
             raise BadRequest("Invalid winner")
         
-        team = next(t for t, members in game["teams"].items() if any(p["name"] == winner for p in members))
-        game["scores"][team] += 20
+        team = players.team_of(game_id, winner)
+        if team:  # The winner may have left since submitting
+            game["scores"][team] += 20
+            leaderboard.record(team, winner, 20)
         emit("cah_result", {
             "winner": winner,
             "card": game["data"]["submissions"][winner],
@@ -463,100 +1785,180 @@ def handle_cah_vote(data):
         emit("error", {"message": str(e)})
 
 # Game Phase Transitions and Scoring
+def build_trivia_round(game):
+    category = random.choice(TRIVIA_CATEGORIES)
+    question = trivia_pool.take(category)
+    data = {
+        "question": question,
+        "buzz": None,
+        "answers": {},
+        "time_limit": 30
+    }
+    return data, {
+        "phase": "trivia",
+        "question": question["q"],
+        "category": question["category"],
+        "time_limit": data["time_limit"]
+    }
+
+def build_pictionary_round(game):
+    return {"time_limit": 60}, {"phase": "pictionary"}
+
+def build_scattergories_round(game):
+    letter = random.choice(string.ascii_uppercase)
+    data = {
+        "letter": letter,
+        "categories": [c["category"] for c in SCATTERGORIES_CATEGORIES],
+        "hints": {c["category"]: c["hint"] for c in SCATTERGORIES_CATEGORIES},
+        "submissions": {},
+        "time_limit": 90
+    }
+    return data, {
+        "phase": "scattergories",
+        "letter": letter,
+        "categories": data["categories"],
+        "hints": data["hints"],
+        "time_limit": data["time_limit"]
+    }
+
+def build_cah_round(game):
+    judge_team = list(game["teams"].keys())[game["round"] % len(game["teams"])]
+    judge = random.choice([p["name"] for p in game["teams"][judge_team]])
+    prompt = cah_pool.take("prompts")
+    cards = cah_pool.take_many("cards", CAH_HAND_SIZE)
+    data = {
+        "prompt": prompt,
+        "judge": judge,
+        "submissions": {},
+        "cards": cards,
+        "time_limit": 60
+    }
+    return data, {
+        "phase": "cah",
+        "prompt": prompt,
+        "judge": judge,
+        "cards": cards,
+        "time_limit": data["time_limit"]
+    }
+
+PHASE_BUILDERS = {
+    "trivia": build_trivia_round,
+    "pictionary": build_pictionary_round,
+    "scattergories": build_scattergories_round,
+    "cah": build_cah_round
+}
+
+def load_phase(game_id, next_phase, event="phase_change"):
+    # Park the game in "loading" so handlers ignore it, tell the room right away,
+    # and build the round (which may call Gemini) in a background task.
+    game = games[game_id]
+    game["phase"] = "loading"
+    game["data"] = {"next_phase": next_phase}
+    round_no = game["round"]
+    socketio.emit("phase_loading", {"phase": next_phase}, room=game_id)
+    save_game(game_id)  # Keeps the points just scored if the worker dies while the round builds
+
+    def build():
+        data, payload = PHASE_BUILDERS[next_phase](game)
+        if games.get(game_id) is not game or game["round"] != round_no or game["phase"] != "loading":
+            return  # Game was deleted or moved on while content was generating
+        game["phase"] = next_phase
+        game["data"] = data
+        save_game(game_id)
+        arm_round_deadline(game_id)
+        socketio.emit(event, payload, room=game_id)
+        logger.info(f"Game {game_id} transitioned to {next_phase}", extra={"event": "phase_change", "game_id": game_id})
+
+    socketio.start_background_task(build)
+
 def transition_phase(game_id, next_phase):
     try:
-        game = get_game_or_404(game_id)
-        game["phase"] = next_phase
+        game = get_game_or_404(game_id, touch=False)
         game["round"] += 1
-        game["data"] = {}
-        
-        if next_phase == "trivia":
-            category = random.choice(TRIVIA_CATEGORIES)
-            question = generate_trivia_question(category)
-            game["data"] = {
-                "question": question,
-                "buzz": None,
-                "answers": {},
-                "time_limit": 30
-            }
-            emit("phase_change", {
-                "phase": "trivia",
-                "question": question["q"],
-                "category": question["category"],
-                "time_limit": game["data"]["time_limit"]
-            }, room=game_id)
-        elif next_phase == "pictionary":
-            game["data"] = {"time_limit": 60}
-            emit("phase_change", {"phase": "pictionary"}, room=game_id)
-        elif next_phase == "scattergories":
-            letter = random.choice(string.ascii_uppercase)
-            game["data"] = {
-                "letter": letter,
-                "categories": [c["category"] for c in SCATTERGORIES_CATEGORIES],
-                "hints": {c["category"]: c["hint"] for c in SCATTERGORIES_CATEGORIES},
-                "submissions": {},
-                "time_limit": 90
-            }
-            emit("phase_change", {
-                "phase": "scattergories",
-                "letter": letter,
-                "categories": game["data"]["categories"],
-                "hints": game["data"]["hints"],
-                "time_limit": game["data"]["time_limit"]
-            }, room=game_id)
-        elif next_phase == "cah":
-            judge_team = list(game["teams"].keys())[game["round"] % len(game["teams"])]
-            judge = random.choice([p["name"] for p in game["teams"][judge_team]])
-            prompt = generate_cah_prompt()
-            cards = generate_cah_cards(7)
-            game["data"] = {
-                "prompt": prompt,
-                "judge": judge,
-                "submissions": {},
-                "cards": cards,
-                "time_limit": 60
-            }
-            emit("phase_change", {
-                "phase": "cah",
-                "prompt": prompt,
-                "judge": judge,
-                "cards": cards,
-                "time_limit": game["data"]["time_limit"]
-            }, room=game_id)
-        logger.info(f"Game {game_id} transitioned to {next_phase}")
+        drawing_pipeline.discard(game_id)
+        round_timers.cancel(game_id)
+        load_phase(game_id, next_phase)
     except NotFound as e:
-        emit("error", {"message": str(e)}, room=game_id)
+        socketio.emit("error", {"message": str(e)}, room=game_id)
 
 def score_scattergories(game_id):
     try:
-        game = get_game_or_404(game_id)
+        game = get_game_or_404(game_id, touch=False)
+        if game["phase"] != "scattergories" or game["data"].get("scoring"):
+            return
+        game["data"]["scoring"] = True  # Validation yields, so fence off the deadline and late submits
+        round_timers.cancel(game_id)
         submissions = game["data"]["submissions"]
         letter = game["data"]["letter"]
+        categories = game["data"]["categories"]
         scores = defaultdict(int)
+        entries = [(word, category) for words in submissions.values() for word, category in zip(words, categories) if word]
+        verdicts = validate_scattergories_words(entries, letter)
         
-        for category_idx, category in enumerate(game["data"]["categories"]):
+        for category_idx, category in enumerate(categories):
             category_words = {}
             for user, words in submissions.items():
                 word = words[category_idx] if category_idx < len(words) else ""
-                if (word and validate_scattergories_word(word, category, letter) and 
+                if (word and verdicts[scattergories_key(word, category, letter)] and 
                     word.lower() not in category_words.values() and len(word) > 1):
                     category_words[user] = word.lower()
             
             for user, word in category_words.items():
-                team = users[next(sid for sid, u in users.items() if u["name"] == user)]["team"]
+                team = players.team_of(game_id, user)
+                if not team:
+                    continue  # Left the game after submitting
                 scores[team] += 5
+                leaderboard.record(team, user, 5)
         
         for team in game["teams"]:
             game["scores"][team] += scores[team]
         
-        emit("scattergories_result", {
+        socketio.emit("scattergories_result", {
             "submissions": submissions,
             "letter": letter,
             "scores": dict(game["scores"])
         }, room=game_id)
         transition_phase(game_id, "cah")
     except NotFound as e:
-        emit("error", {"message": str(e)}, room=game_id)
+        socketio.emit("error", {"message": str(e)}, room=game_id)
+
+def arm_round_deadline(game_id, seconds=None):
+    game = games[game_id]
+    if seconds is None:
+        seconds = game["data"]["time_limit"] + ROUND_GRACE_SECONDS
+    round_timers.arm(game_id, seconds, handle_round_deadline, game_id, game["round"], game["phase"])
+
+def handle_round_deadline(game_id, round_no, phase):
+    # Runs in a greenlet of its own, outside any request, so only socketio.emit is available here
+    game = games.get(game_id)
+    if not game or game["round"] != round_no or game["phase"] != phase:
+        return
+    logger.info(f"Game {game_id} {phase} round timed out", extra={"event": "round_timeout", "game_id": game_id})
+    if phase == "trivia":
+        socketio.emit("round_timeout", {"phase": phase, "answer": game["data"]["question"]["a"]}, room=game_id)
+        transition_phase(game_id, "pictionary")
+    elif phase == "pictionary":
+        socketio.emit("round_timeout", {"phase": phase, "answer": game["data"].get("word")}, room=game_id)
+        transition_phase(game_id, "scattergories")
+    elif phase == "scattergories":
+        score_scattergories(game_id)
+    elif phase == "cah":
+        submissions = game["data"]["submissions"]
+        if submissions and not game["data"].get("voting"):
+            # Let the judge pick from whatever came in before giving up
+            start_cah_voting(game_id)
+        else:
+            socketio.emit("round_timeout", {"phase": phase}, room=game_id)
+            transition_phase(game_id, "trivia")
+
+def start_cah_voting(game_id):
+    game = games[game_id]
+    game["data"]["voting"] = True
+    socketio.emit("cah_voting", {
+        "prompt": game["data"]["prompt"],
+        "submissions": {k: v for k, v in game["data"]["submissions"].items()}
+    }, room=game_id)
+    arm_round_deadline(game_id, CAH_VOTE_SECONDS)
 
 # Error handlers
 @app.errorhandler(404)
@@ -568,5 +1970,29 @@ def server_error(error):
     logger.error(f"Server error: {str(error)}")
     return jsonify({"error": "Internal server error"}), 500
 
+def restore_games():
+    started = time.monotonic()
+    # Everything restore allocates stays live, so collector passes would only slow it down
+    gc.disable()
+    try:
+        restored = game_journal.restore()
+        for game_id, game in restored.items():
+            install_game(game_id, game)
+    finally:
+        gc.enable()
+    if len(restored) > MAX_GAMES:
+        # Only happens when MAX_GAMES was lowered since the journal was written; install_game evicted the oldest
+        logger.warning(f"Journal held {len(restored)} games but MAX_GAMES is {MAX_GAMES}; evicted {len(restored) - MAX_GAMES} of them", extra={"event": "restore_over_capacity"})
+    game_journal.start()
+    if restored:
+        game_journal.stats.update(restored_games=len(restored), restore_seconds=round(time.monotonic() - started, 3))
+        logger.info(f"Restored {len(restored)} games from {GAME_JOURNAL} in {game_journal.stats['restore_seconds']}s", extra={"event": "games_restored"})
+
+restore_games()
+socketio.start_background_task(warm_content_pools)
+socketio.start_background_task(reap_idle_games)
+if score_feed and WORKER_INDEX == LEADERBOARD_WORKER:
+    socketio.start_background_task(leaderboard.follow, score_feed.messages())
+
 if __name__ == "__main__":
-    socketio.run(app, host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
+    socketio.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""Per-connection token buckets for Socket.IO events.
+
+main.socket_event checks every event against its bucket before the handler
+runs, so an event dropped here never touches game state.
+"""
+import time
+
+class RateLimiter:
+    """Token buckets per sid and event, refilled lazily when checked.
+
+    A bucket is [tokens, last check]; a check is two dict lookups and a
+    little arithmetic, so it is cheap enough to run ahead of every handler.
+    """
+
+    def __init__(self):
+        self.buckets = {}  # sid -> {event: [tokens, updated]}
+
+    def allow(self, sid, event, rate, burst):
+        now = time.monotonic()
+        buckets = self.buckets.get(sid)
+        if buckets is None:
+            buckets = self.buckets[sid] = {}
+        bucket = buckets.get(event)
+        if bucket is None:
+            buckets[event] = [burst - 1, now]
+            return True
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def forget(self, sid):
+        self.buckets.pop(sid, None)
@@ -0,0 +1,125 @@
+"""Audiences for running games, fed throttled and batched updates in their own room."""
+import logging
+from collections import defaultdict
+from werkzeug.exceptions import BadRequest
+
+logger = logging.getLogger(__name__)
+
+class SpectatorFeed:
+    """Throttled, batched game state for audiences in a separate spectator room.
+
+    Spectators never join the game's own room, so player broadcasts reach the
+    same sockets however many people watch. One greenlet wakes every interval
+    and sends each watched game at most one spectator_update, encoded once for
+    the whole room: the public state when it changed, plus any strokes drawn
+    since the previous update.
+
+    describe(game_id) returns a game's public state (with "phase" and "round"),
+    or None once the game is gone; drawing_snapshot(game_id) returns the
+    encoded drawing so far. A stroke backlog longer than max_backlog bytes is
+    replaced by that snapshot.
+    """
+
+    def __init__(self, socketio, interval, max_per_game, describe, drawing_snapshot, max_backlog):
+        self.socketio = socketio
+        self.interval = interval
+        self.max_per_game = max_per_game
+        self.describe = describe
+        self.drawing_snapshot = drawing_snapshot
+        self.max_backlog = max_backlog
+        self.sessions = {}  # sid -> game_id
+        self.watchers = defaultdict(int)  # game_id -> spectators
+        self.sent = {}  # game_id -> last state sent
+        self.strokes = {}  # game_id -> {"round", "frames": [encoded frames drawn since the last update], "size"}
+        self.updates = 0
+        self.running = False
+
+    @staticmethod
+    def room(game_id):
+        return f"{game_id}:spectators"
+
+    def add(self, sid, game_id):
+        if self.watchers.get(game_id, 0) >= self.max_per_game:
+            raise BadRequest("Too many spectators")
+        self.sessions[sid] = game_id
+        self.watchers[game_id] += 1
+        if not self.running:
+            self.running = True
+            self.socketio.start_background_task(self.run)
+
+    def remove(self, sid):
+        game_id = self.sessions.pop(sid, None)
+        if game_id is None:
+            return None
+        self.watchers[game_id] -= 1
+        if not self.watchers[game_id]:
+            self.forget(game_id)
+        return game_id
+
+    def forget(self, game_id):
+        self.watchers.pop(game_id, None)
+        self.sent.pop(game_id, None)
+        self.strokes.pop(game_id, None)
+
+    def drew(self, game_id, round_no, frame):
+        # Called from the drawing flush with the frame it broadcast; a no-op for games nobody watches
+        if game_id not in self.watchers:
+            return
+        entry = self.strokes.get(game_id)
+        if entry is None or entry["round"] != round_no:
+            entry = self.strokes[game_id] = {"round": round_no, "frames": [], "size": 0}
+        entry["frames"].append(frame)
+        entry["size"] += len(frame)
+
+    def state(self, game_id):
+        state = self.describe(game_id)
+        if state is not None:
+            state["spectators"] = self.watchers.get(game_id, 0)
+        return state
+
+    def welcome(self, game_id):
+        # First update for a new spectator: full state and the whole drawing so far
+        payload = self.state(game_id)
+        if payload["phase"] == "pictionary":
+            payload["frame"] = self.drawing_snapshot(game_id)
+            payload["reset"] = True
+        return payload
+
+    def run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            for game_id in list(self.watchers):
+                try:
+                    self.flush(game_id)
+                except Exception as e:
+                    logger.error(f"Spectator update for game {game_id} failed: {str(e)}")
+
+    def flush(self, game_id):
+        state = self.state(game_id)
+        if state is None:
+            return
+        payload = None
+        if state != self.sent.get(game_id):
+            self.sent[game_id] = state
+            payload = dict(state)
+        entry = self.strokes.pop(game_id, None)
+        if entry and entry["round"] == state["round"]:
+            payload = payload or {"round": state["round"]}
+            if entry["size"] > self.max_backlog:
+                # Catching up from the trimmed history is cheaper than the backlog
+                payload["frame"] = self.drawing_snapshot(game_id)
+                payload["reset"] = True
+            else:
+                # Frames are runs of commands, so consecutive ones simply concatenate
+                payload["frame"] = b"".join(entry["frames"])
+        if payload:
+            self.socketio.emit("spectator_update", payload, room=self.room(game_id))
+            self.updates += 1
+
+    def discard(self, game_id, reason):
+        if game_id in self.watchers:
+            self.socketio.emit("game_closed", {"reason": reason}, room=self.room(game_id))
+            self.socketio.close_room(self.room(game_id))
+        for sid in [sid for sid, watched in self.sessions.items() if watched == game_id]:
+            del self.sessions[sid]
+        self.forget(game_id)
@@ -0,0 +1,524 @@
+const socket = io();
+let gameId = null;
+let userName = null;
+let teamName = null;
+let isDrawer = false;
+let currentPhase = "lobby";
+let watching = false;
+
+// Utility functions
+function showPhase(phase) {
+    document.querySelectorAll(".phase").forEach(p => p.classList.add("hidden"));
+    document.getElementById(phase).classList.remove("hidden");
+    currentPhase = phase;
+}
+
+function showMessage(msg) {
+    const messages = document.getElementById("messages");
+    messages.textContent = msg;
+    messages.classList.remove("hidden");
+    setTimeout(() => messages.classList.add("hidden"), 5000);
+}
+
+// Reconnect with the game ID so the socket lands on the worker hosting
+// the game and picks up the session cookie set by the form post.
+function connectToGame() {
+    socket.io.opts.query = { game_id: gameId };
+    socket.disconnect().connect();
+}
+
+// Also runs on automatic reconnects, e.g. once a restarted server has
+// restored the game from its journal
+socket.on("connect", () => {
+    if (!gameId) return;
+    if (watching) {
+        socket.emit("spectate", { game_id: gameId });
+    } else {
+        socket.emit("join", { team: teamName, game_id: gameId, user_name: userName });
+    }
+});
+
+function updateScoreboard(scores) {
+    const tbody = document.querySelector("#scoreTable tbody");
+    tbody.innerHTML = "";
+    for (const [team, score] of Object.entries(scores)) {
+        const row = `<tr><td>${team}</td><td>${score}</td></tr>`;
+        tbody.innerHTML += row;
+    }
+}
+
+function startTimer(elementId, seconds, callback) {
+    let timeLeft = seconds;
+    const timer = document.getElementById(elementId);
+    timer.textContent = `Time Left: ${timeLeft}s`;
+    const interval = setInterval(() => {
+        timeLeft--;
+        timer.textContent = `Time Left: ${timeLeft}s`;
+        if (timeLeft <= 0) {
+            clearInterval(interval);
+            if (callback) callback();
+        }
+    }, 1000);
+    return interval;
+}
+
+// Lobby handling
+document.getElementById("createForm").addEventListener("submit", e => {
+    e.preventDefault();
+    userName = document.getElementById("createUserName").value.trim();
+    teamName = document.getElementById("createTeamName").value.trim();
+    if (userName.length < 2 || teamName.length < 2) {
+        showMessage("Names must be at least 2 characters");
+        return;
+    }
+    fetch("/create_game", {
+        method: "POST",
+        body: new URLSearchParams({ user_name: userName, team_name: teamName }),
+        headers: { "Content-Type": "application/x-www-form-urlencoded" }
+    })
+    .then(res => res.json())
+    .then(data => {
+        if (data.error) throw new Error(data.error);
+        gameId = data.game_id;
+        teamName = data.team;
+        document.getElementById("gameIdDisplay").textContent = gameId;
+        document.getElementById("lobbyInfo").classList.remove("hidden");
+        watching = false;
+        document.getElementById("startGameBtn").classList.remove("hidden");
+        connectToGame();
+    })
+    .catch(err => showMessage(err.message));
+});
+
+document.getElementById("joinForm").addEventListener("submit", e => {
+    e.preventDefault();
+    userName = document.getElementById("joinUserName").value.trim();
+    teamName = document.getElementById("joinTeamName").value.trim();
+    gameId = document.getElementById("gameId").value.trim().toUpperCase();
+    if (userName.length < 2 || teamName.length < 2 || gameId.length !== 6) {
+        showMessage("Invalid input: Names 2+ chars, Game ID 6 chars");
+        return;
+    }
+    fetch(`/join_game?game_id=${encodeURIComponent(gameId)}`, {
+        method: "POST",
+        body: new URLSearchParams({ user_name: userName, team_name: teamName, game_id: gameId }),
+        headers: { "Content-Type": "application/x-www-form-urlencoded" }
+    })
+    .then(res => res.json())
+    .then(data => {
+        if (data.error) throw new Error(data.error);
+        gameId = data.game_id;
+        teamName = data.team;
+        document.getElementById("gameIdDisplay").textContent = gameId;
+        document.getElementById("lobbyInfo").classList.remove("hidden");
+        watching = false;
+        connectToGame();
+    })
+    .catch(err => showMessage(err.message));
+});
+
+document.getElementById("startGameBtn").addEventListener("click", () => {
+    socket.emit("start_game", { game_id: gameId });
+});
+
+// Lobby roster: a versioned snapshot, then deltas on top of it
+let lobbyTeams = {};
+let lobbyVersion = null;
+
+function renderLobby() {
+    const teamList = document.getElementById("teamList");
+    teamList.innerHTML = "";
+    for (const [team, players] of Object.entries(lobbyTeams)) {
+        const li = document.createElement("li");
+        li.className = "list-group-item";
+        li.textContent = `${team}: ${players.join(", ")}`;
+        teamList.appendChild(li);
+    }
+}
+
+socket.on("lobby_snapshot", data => {
+    lobbyTeams = data.teams;
+    lobbyVersion = data.version;
+    renderLobby();
+});
+
+socket.on("lobby_delta", data => {
+    // A joiner's snapshot can already include some or all of a delta's changes
+    if (lobbyVersion === null || data.version <= lobbyVersion) return;
+    if (data.base > lobbyVersion) {
+        socket.emit("lobby_sync");
+        return;
+    }
+    // Each change is one version step, so skip the ones the snapshot had
+    for (const change of data.changes.slice(lobbyVersion - data.base)) {
+        const players = lobbyTeams[change.team] || [];
+        if (change.op === "join") {
+            lobbyTeams[change.team] = [...players, change.name];
+        } else {
+            lobbyTeams[change.team] = players.filter(name => name !== change.name);
+            if (!lobbyTeams[change.team].length) delete lobbyTeams[change.team];
+        }
+    }
+    lobbyVersion = data.version;
+    renderLobby();
+});
+
+// Game start
+socket.on("game_start", data => {
+    showPhase("trivia");
+    document.getElementById("triviaQuestion").textContent = data.question;
+    document.getElementById("triviaCategory").textContent = data.category;
+    startTimer("triviaTimer", data.time_limit, () => showMessage("Time's up!"));
+});
+
+// Trivia handling
+document.getElementById("buzzBtn").addEventListener("click", () => {
+    socket.emit("buzz");
+});
+
+socket.on("buzz_response", data => {
+    showMessage(data.message);
+    if (data.user === userName) {
+        document.getElementById("buzzBtn").classList.add("hidden");
+        document.getElementById("answerSection").classList.remove("hidden");
+    }
+});
+
+document.getElementById("submitAnswerBtn").addEventListener("click", () => {
+    const answer = document.getElementById("triviaAnswer").value.trim();
+    if (answer) {
+        socket.emit("trivia_answer", { answer });
+        document.getElementById("triviaAnswer").value = "";
+    }
+});
+
+socket.on("trivia_result", data => {
+    const result = document.getElementById("triviaResult");
+    result.textContent = `${data.user} answered ${data.correct ? "correctly" : "incorrectly"} with "${data.answer || ""}"`;
+    if (data.scores) updateScoreboard(data.scores);
+    if (!data.correct) {
+        document.getElementById("answerSection").classList.add("hidden");
+        document.getElementById("buzzBtn").classList.remove("hidden");
+    }
+});
+
+// Phase transitions
+socket.on("phase_loading", data => {
+    showMessage(`Loading ${data.phase}...`);
+});
+
+socket.on("round_timeout", data => {
+    showMessage(data.answer ? `Time's up! The answer was "${data.answer}"` : "Time's up!");
+});
+
+socket.on("game_closed", data => {
+    gameId = null;
+    watching = false;
+    showPhase("lobby");
+    document.getElementById("lobbyInfo").classList.add("hidden");
+    document.getElementById("startGameBtn").classList.add("hidden");
+    const reasons = {
+        idle: "Game closed after being idle too long",
+        capacity: "Game closed to make room for new games",
+        ended: "Game over: everyone left"
+    };
+    showMessage(reasons[data.reason] || "Game closed");
+});
+
+socket.on("phase_change", data => {
+    showPhase(data.phase);
+    if (data.phase === "pictionary") {
+        document.getElementById("pictionaryWord").textContent = "Waiting for drawer...";
+        document.getElementById("pictionaryHint").textContent = "";
+    } else if (data.phase === "scattergories") {
+        document.getElementById("scatterLetter").textContent = data.letter;
+        const categoriesDiv = document.getElementById("scatterCategories");
+        categoriesDiv.innerHTML = "";
+        data.categories.forEach((cat, idx) => {
+            categoriesDiv.innerHTML += `
+                <div class="mb-3">
+                    <label class="form-label">${cat} (${data.hints[cat]})</label>
+                    <input type="text" class="form-control" name="word${idx}">
+                </div>`;
+        });
+        startTimer("scatterTimer", data.time_limit, () => showMessage("Time's up!"));
+    } else if (data.phase === "cah") {
+        document.getElementById("cahPrompt").textContent = data.prompt;
+        document.getElementById("cahJudge").textContent = data.judge;
+        const cardsDiv = document.getElementById("cahCards");
+        cardsDiv.innerHTML = "";
+        if (data.judge !== userName) {
+            data.cards.forEach(card => {
+                cardsDiv.innerHTML += `<button class="btn btn-light m-1 cah-card" data-card="${card}">${card}</button>`;
+            });
+            document.querySelectorAll(".cah-card").forEach(btn => {
+                btn.addEventListener("click", () => {
+                    socket.emit("cah_submit", { card: btn.dataset.card });
+                    btn.disabled = true;
+                });
+            });
+        } else {
+            cardsDiv.innerHTML = "<p>You are the judge this round.</p>";
+        }
+        startTimer("cahTimer", data.time_limit, () => showMessage("Time's up!"));
+    } else if (data.phase === "trivia") {
+        document.getElementById("triviaQuestion").textContent = data.question;
+        document.getElementById("triviaCategory").textContent = data.category;
+        document.getElementById("buzzBtn").classList.remove("hidden");
+        document.getElementById("answerSection").classList.add("hidden");
+        document.getElementById("triviaResult").textContent = "";
+        startTimer("triviaTimer", data.time_limit, () => showMessage("Time's up!"));
+    }
+});
+
+// Pictionary handling
+socket.on("pictionary_start", data => {
+    document.getElementById("drawerName").textContent = data.drawer;
+    document.getElementById("pictionaryWord").textContent = data.word;
+    document.getElementById("pictionaryHint").textContent = data.hint;
+    isDrawer = data.drawer === userName;
+    document.getElementById("drawingControls").classList.toggle("hidden", !isDrawer);
+    document.getElementById("pictionaryGuess").disabled = isDrawer;
+    document.getElementById("submitGuessBtn").disabled = isDrawer;
+    document.getElementById("guessChat").innerHTML = "";
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    startTimer("pictionaryTimer", data.time_limit, () => showMessage("Time's up!"));
+    if (isDrawer) initCanvas();
+});
+
+const canvas = document.getElementById("drawingCanvas");
+const ctx = canvas.getContext("2d");
+ctx.lineWidth = 2;
+ctx.lineCap = "round";
+ctx.strokeStyle = "#000";
+let drawing = false;
+let lastX = 0;
+let lastY = 0;
+// Points go out at most 60 times a second however fast the display fires
+// mousemove, which keeps the drawer under the server's per-connection limit
+const POINT_INTERVAL_MS = 1000 / 60;
+let lastPointSent = 0;
+let pendingPoint = null;
+
+function initCanvas() {
+    canvas.addEventListener("mousedown", startDrawing);
+    canvas.addEventListener("mousemove", draw);
+    canvas.addEventListener("mouseup", stopDrawing);
+    canvas.addEventListener("mouseout", stopDrawing);
+
+    canvas.addEventListener("touchstart", e => {
+        e.preventDefault();
+        const touch = e.touches[0];
+        startDrawing({ offsetX: touch.clientX - canvas.offsetLeft, offsetY: touch.clientY - canvas.offsetTop });
+    });
+    canvas.addEventListener("touchmove", e => {
+        e.preventDefault();
+        const touch = e.touches[0];
+        draw({ offsetX: touch.clientX - canvas.offsetLeft, offsetY: touch.clientY - canvas.offsetTop });
+    });
+    canvas.addEventListener("touchend", stopDrawing);
+}
+
+function sendPoint(x, y) {
+    socket.emit("drawing", { x, y, drawing: true });
+    lastPointSent = performance.now();
+    pendingPoint = null;
+}
+
+function startDrawing(e) {
+    drawing = true;
+    pendingPoint = null;
+    ctx.beginPath();
+    ctx.moveTo(e.offsetX, e.offsetY);
+    socket.emit("drawing", { x: e.offsetX, y: e.offsetY, drawing: true, start: true });
+}
+
+function draw(e) {
+    if (!drawing) return;
+    ctx.lineTo(e.offsetX, e.offsetY);
+    ctx.stroke();
+    if (performance.now() - lastPointSent >= POINT_INTERVAL_MS) {
+        sendPoint(e.offsetX, e.offsetY);
+    } else {
+        pendingPoint = { x: e.offsetX, y: e.offsetY };
+    }
+}
+
+function stopDrawing() {
+    if (drawing) {
+        drawing = false;
+        // The stroke's last point, so other canvases end where the drawer's did
+        if (pendingPoint) sendPoint(pendingPoint.x, pendingPoint.y);
+        ctx.closePath();
+    }
+}
+
+document.getElementById("clearCanvas").addEventListener("click", () => {
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    socket.emit("drawing", { x: 0, y: 0, drawing: false });
+});
+
+// Frames are int16 runs: a signed point count (positive starts a stroke,
+// negative continues the last one, zero clears), the first point, then deltas.
+function renderFrame(buffer, target = ctx) {
+    // The msgpack parser hands binary over as a Uint8Array rather than an ArrayBuffer
+    const cmds = new Int16Array(ArrayBuffer.isView(buffer) ? buffer.slice().buffer : buffer);
+    let i = 0;
+    while (i < cmds.length) {
+        const count = cmds[i++];
+        if (count === 0) {
+            target.clearRect(0, 0, target.canvas.width, target.canvas.height);
+            continue;
+        }
+        let x = cmds[i++];
+        let y = cmds[i++];
+        target.beginPath();
+        if (count > 0) {
+            target.moveTo(x, y);
+        } else {
+            target.moveTo(lastX, lastY);
+        }
+        target.lineTo(x, y);
+        for (let k = 1; k < Math.abs(count); k++) {
+            x += cmds[i++];
+            y += cmds[i++];
+            target.lineTo(x, y);
+        }
+        target.stroke();
+        lastX = x;
+        lastY = y;
+    }
+}
+
+socket.on("drawing_update", data => {
+    if (!isDrawer) renderFrame(data.frame);
+});
+
+socket.on("drawing_snapshot", data => {
+    showPhase("pictionary");
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    renderFrame(data.frame);
+});
+
+document.getElementById("submitGuessBtn").addEventListener("click", () => {
+    const guess = document.getElementById("pictionaryGuess").value.trim();
+    if (guess) {
+        socket.emit("pictionary_guess", { guess });
+        document.getElementById("pictionaryGuess").value = "";
+    }
+});
+
+socket.on("pictionary_guess", data => {
+    const chat = document.getElementById("guessChat");
+    // Guesses arrive in batches when they come in faster than the server's broadcast window
+    data.guesses.forEach(({ user, guess }) => {
+        chat.innerHTML += `<p>${user}: ${guess}</p>`;
+    });
+    chat.scrollTop = chat.scrollHeight;
+});
+
+socket.on("pictionary_result", data => {
+    showMessage(`${data.user} guessed "${data.word}" correctly!`);
+    if (data.scores) updateScoreboard(data.scores);
+});
+
+// Scattergories handling
+document.getElementById("scatterForm").addEventListener("submit", e => {
+    e.preventDefault();
+    const words = Array.from(document.querySelectorAll("#scatterCategories input")).map(input => input.value.trim());
+    socket.emit("scattergories_submit", { words });
+});
+
+socket.on("submission_received", data => {
+    showMessage(`${data.user} submitted their answers`);
+});
+
+socket.on("scattergories_result", data => {
+    const result = document.getElementById("scatterResult");
+    result.innerHTML = `<h4>Results (Letter: ${data.letter})</h4>`;
+    for (const [user, words] of Object.entries(data.submissions)) {
+        result.innerHTML += `<p>${user}: ${words.join(", ")}</p>`;
+    }
+    if (data.scores) updateScoreboard(data.scores);
+});
+
+// CAH handling
+socket.on("cah_voting", data => {
+    const submissionsDiv = document.getElementById("cahSubmissions");
+    submissionsDiv.classList.remove("hidden");
+    submissionsDiv.innerHTML = "<h4>Vote for the best:</h4>";
+    for (const [user, card] of Object.entries(data.submissions)) {
+        submissionsDiv.innerHTML += `
+            <div class="form-check">
+                <input type="radio" name="vote" value="${user}" class="form-check-input">
+                <label class="form-check-label">${data.prompt.replace("___", card)}</label>
+            </div>`;
+    }
+    if (userName === document.getElementById("cahJudge").textContent) {
+        submissionsDiv.innerHTML += `<button id="submitVote" class="btn btn-primary mt-2">Submit Vote</button>`;
+        document.getElementById("submitVote").addEventListener("click", () => {
+            const winner = document.querySelector("input[name='vote']:checked")?.value;
+            if (winner) socket.emit("cah_vote", { winner });
+        });
+    }
+    document.getElementById("cahCards").classList.add("hidden");
+});
+
+socket.on("cah_result", data => {
+    showMessage(`${data.winner} won with "${data.card}"!`);
+    document.getElementById("cahSubmissions").classList.add("hidden");
+    if (data.scores) updateScoreboard(data.scores);
+});
+
+// General socket events
+// Spectators: throttled state and stroke batches from the spectator room
+const spectatorCtx = document.getElementById("spectatorCanvas").getContext("2d");
+let spectatorRound = null;
+
+function describeRound(phase, detail) {
+    if (phase === "loading") return `Up next: ${detail.next_phase}`;
+    if (phase === "trivia") return `${detail.category}: ${detail.question}${detail.buzz ? ` (${detail.buzz} buzzed in)` : ""}`;
+    if (phase === "pictionary") return detail.drawer ? `${detail.drawer} is drawing. Hint: ${detail.hint || "..."} (${detail.guesses} guesses)` : "Waiting for a drawer...";
+    if (phase === "scattergories") return `Letter ${detail.letter}, ${detail.submitted} submitted`;
+    if (phase === "cah") return `${detail.prompt} (judge: ${detail.judge}, ${detail.submitted} submitted)`;
+    return "Waiting for the game to start...";
+}
+
+document.getElementById("watchForm").addEventListener("submit", e => {
+    e.preventDefault();
+    gameId = document.getElementById("watchGameId").value.trim().toUpperCase();
+    if (gameId.length !== 6) {
+        showMessage("Game ID must be 6 characters");
+        return;
+    }
+    document.getElementById("spectatorGameId").textContent = gameId;
+    spectatorRound = null;
+    watching = true;
+    connectToGame();
+});
+
+socket.on("spectator_update", data => {
+    if (data.round !== spectatorRound || data.reset) {
+        spectatorCtx.clearRect(0, 0, spectatorCtx.canvas.width, spectatorCtx.canvas.height);
+        spectatorRound = data.round;
+    }
+    if (data.phase !== undefined) {
+        showPhase("spectator");
+        document.getElementById("spectatorPhase").textContent = data.phase;
+        document.getElementById("spectatorCount").textContent = data.spectators;
+        document.getElementById("spectatorDetail").textContent = describeRound(data.phase, data.detail);
+        const teamList = document.getElementById("spectatorTeams");
+        teamList.innerHTML = "";
+        for (const [team, players] of Object.entries(data.teams)) {
+            const li = document.createElement("li");
+            li.className = "list-group-item";
+            li.textContent = `${team}: ${players.join(", ")}`;
+            teamList.appendChild(li);
+        }
+        updateScoreboard(data.scores);
+    }
+    if (data.frame) renderFrame(data.frame, spectatorCtx);
+});
+
+socket.on("message", data => showMessage(data.data));
+socket.on("error", data => showMessage(data.message));
@@ -0,0 +1,35 @@
+import os
+import sys
+import eventlet
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pump():
+    # Let the handlers' background greenlets run
+    for _ in range(5):
+        eventlet.sleep(0.01)
+
+@pytest.fixture(scope="session")
+def server():
+    # Purely in memory: no content store or journal on disk, and no Gemini warmup
+    os.environ.update(CONTENT_STORE="", GAME_JOURNAL="", CONTENT_WARMUP_DELAY="3600")
+    import main
+    return main
+
+@pytest.fixture
+def lobby(server):
+    # A game with alice (leader, Red) and bob (Blue); connect(name, team) opens a socket and joins
+    http = {name: server.app.test_client() for name in ("alice", "bob")}
+    game_id = http["alice"].post("/create_game", data={"team_name": "Red", "user_name": "alice"}).json["game_id"]
+    http["bob"].post("/join_game", data={"team_name": "Blue", "user_name": "bob", "game_id": game_id})
+
+    def connect(name, team):
+        client = server.socketio.test_client(server.app, flask_test_client=http[name])
+        client.emit("join", {"team": team, "game_id": game_id, "user_name": name})
+        pump()
+        return client
+    yield game_id, connect
+    if game_id in server.games:
+        server.delete_game(game_id)
@@ -0,0 +1,63 @@
+from array import array
+
+def decode(frame):
+    # Strokes as lists of absolute points; raises on anything a client couldn't draw
+    strokes, i = [], 0
+    while i < len(frame):
+        count = frame[i]
+        i += 1
+        if count == 0:
+            strokes.clear()
+            continue
+        assert count > 0 or strokes, "continuation with no stroke to continue"
+        x, y = frame[i], frame[i + 1]
+        points = [(x, y)]
+        i += 2
+        for _ in range(abs(count) - 1):
+            x, y = x + frame[i], y + frame[i + 1]
+            points.append((x, y))
+            i += 2
+        if count > 0:
+            strokes.append(points)
+        else:
+            strokes[-1].extend(points)
+    assert i == len(frame), "frame ends inside a segment"
+    return strokes
+
+def line(x, y, n, dx=5, dy=3):
+    # Points far enough apart that simplification keeps every one
+    return [(x + dx * k, y + dy * k) for k in range(n)]
+
+def history(server, segments):
+    frame = array("h")
+    for new_stroke, points in segments:
+        server.encode_segment(frame, new_stroke, points)
+    return frame
+
+def test_encoded_segments_decode_to_the_points(server):
+    a, b = line(10, 10, 4), line(200, 50, 3, dx=-7)
+    frame = history(server, [(True, a[:2]), (False, a[2:]), (True, b)])
+    assert decode(frame) == [a, b]
+    assert frame[0] == 2 and frame[5] == -2
+
+def test_trim_turns_a_leading_continuation_into_a_stroke_start(server):
+    a, a_more, b = line(10, 10, 6), line(40, 28, 20), line(300, 300, 5, dy=-4)
+    frame = history(server, [(True, a), (False, a_more), (True, b)])
+    # Just too long to keep the first segment, which is the start of stroke a
+    server.trim_history(frame, len(frame) - 1)
+    assert frame[0] == len(a_more)
+    assert decode(frame) == [a_more, b]
+
+def test_trim_drops_whole_segments_only(server):
+    a, b, c = line(0, 0, 10), line(100, 100, 10), line(200, 0, 3)
+    frame = history(server, [(True, a), (True, b), (False, c)])
+    full = len(frame)
+    server.trim_history(frame, full)
+    assert len(frame) == full
+
+    server.trim_history(frame, 1 + 2 * len(c) + 5)
+    assert decode(frame) == [c]
+    assert len(frame) == 1 + 2 * len(c)
+
+    server.trim_history(frame, 0)
+    assert len(frame) == 0
@@ -0,0 +1,102 @@
+import os
+import time
+import eventlet
+import pytest
+from journal import GameJournal
+
+def game(phase, round_no=0, **scores):
+    return {"phase": phase, "round": round_no, "scores": scores, "teams": {}}
+
+def settle(journal, **expected):
+    # The writer runs in its own greenlet and does its disk work on tpool threads
+    deadline = time.monotonic() + 5
+    while any(journal.stats[key] < value for key, value in expected.items()):
+        assert time.monotonic() < deadline, f"journal stats stuck at {journal.stats}"
+        eventlet.sleep(0.01)
+
+def started(directory, games):
+    journal = GameJournal(str(directory), 3600, games)
+    assert journal.restore() == {}
+    journal.start()
+    return journal
+
+def restore(directory):
+    journal = GameJournal(str(directory), 3600, {})
+    return journal, journal.restore()
+
+def test_restore_replays_segments_after_the_snapshot(tmp_path):
+    games = {"A": game("lobby"), "B": game("trivia", 1, Red=10)}
+    journal = started(tmp_path, games)
+    journal.save("A", games["A"])
+    journal.save("B", games["B"])
+    settle(journal, records=2)
+    journal.snapshot()
+    settle(journal, snapshots=1)
+    assert sorted(os.listdir(tmp_path)) == ["journal-00000002.jsonl", "snapshot.json"]
+
+    games["C"] = game("lobby")
+    journal.save("C", games["C"])
+    journal.delete("A")
+    del games["A"]
+    games["B"]["round"] = 2
+    journal.save("B", games["B"])
+    settle(journal, records=5)
+    # A crash mid-write leaves half a record at the end of the live segment
+    with open(tmp_path / "journal-00000002.jsonl", "ab") as f:
+        f.write(b'{"op":"save","id":"D","game":{"pha')
+
+    restored_journal, restored = restore(tmp_path)
+    assert restored == {"B": game("trivia", 2, Red=10), "C": game("lobby")}
+    assert restored_journal.segment == 3
+
+def test_restore_after_a_crash_before_the_snapshot_is_swapped_in(tmp_path, monkeypatch):
+    games = {"A": game("lobby"), "B": game("lobby")}
+    journal = started(tmp_path, games)
+    journal.save("A", games["A"])
+    journal.save("B", games["B"])
+    journal.snapshot()
+    settle(journal, records=2, snapshots=1)
+
+    journal.delete("A")
+    del games["A"]
+    games["C"] = game("cah", 1, Blue=20)
+    journal.save("C", games["C"])
+    settle(journal, records=4)
+
+    def crash(src, dst):
+        raise OSError("killed before the rename")
+    monkeypatch.setattr(os, "replace", crash)
+    journal.snapshot()
+    settle(journal, write_failures=1)
+    monkeypatch.undo()
+    games["D"] = game("lobby")
+    journal.save("D", games["D"])
+    settle(journal, records=5)
+    # The new snapshot never replaced the old one, so neither it nor the segments it covers are gone
+    assert sorted(os.listdir(tmp_path)) == ["journal-00000002.jsonl", "journal-00000003.jsonl", "snapshot.json", "snapshot.json.tmp"]
+
+    restored_journal, restored = restore(tmp_path)
+    assert restored == {"B": game("lobby"), "C": game("cah", 1, Blue=20), "D": game("lobby")}
+    assert restored_journal.segment == 4
+
+def test_changes_made_while_restoring_land_in_the_new_segment(tmp_path):
+    journal = started(tmp_path, {})
+    journal.save("A", game("lobby"))
+    settle(journal, records=1)
+
+    journal, restored = restore(tmp_path)
+    # Installing a restored game may save or evict it before the writer starts
+    journal.delete("A")
+    journal.start()
+    settle(journal, records=1)
+    assert journal.stats["write_failures"] == 0
+    assert restore(tmp_path)[1] == {}
+
+@pytest.mark.parametrize("torn", [b'{"op":"delete","id":"A"', b"\x00\x00\x00"])
+def test_torn_last_line_is_skipped(tmp_path, torn):
+    journal = started(tmp_path, {})
+    journal.save("A", game("lobby"))
+    settle(journal, records=1)
+    with open(tmp_path / "journal-00000001.jsonl", "ab") as f:
+        f.write(torn)
+    assert restore(tmp_path)[1] == {"A": game("lobby")}
@@ -0,0 +1,35 @@
+import orjson
+from leaderboard import TopK, Leaderboard
+
+def test_topk_keeps_the_best_k_in_order():
+    top = TopK(3)
+    for name, points in [("a", 5), ("b", 10), ("c", 1), ("d", 7), ("c", 20)]:
+        top.add(name, points)
+    assert top.entries() == [{"name": "c", "score": 21}, {"name": "b", "score": 10}, {"name": "d", "score": 7}]
+
+def test_topk_forgets_the_lower_half_past_its_candidates():
+    top = TopK(2, candidates=10)
+    for i in range(100):
+        top.add(f"n{i}", i)
+    assert len(top.totals) <= 10
+    assert top.entries() == [{"name": "n99", "score": 99}, {"name": "n98", "score": 98}]
+    # A forgotten name starts from zero; a kept one keeps its total
+    top.add("n50", 100)
+    top.add("n99", 1)
+    assert top.totals["n50"] == 100
+    assert top.totals["n99"] == 100
+    assert top.entries() == [{"name": "n50", "score": 100}, {"name": "n99", "score": 100}]
+
+def test_scores_published_by_other_workers_reach_the_board():
+    published = []
+    worker = Leaderboard(5, worker=1, publish=published.append)
+    worker.record("Red", "alice", 10)
+    worker.record("Blue", "bob", 0)
+    assert worker.version == 0
+    assert published == [{"team": "Red", "player": "alice", "points": 10}]
+
+    board = Leaderboard(5)
+    board.record("Blue", "bob", 5)
+    board.follow([orjson.dumps(score) for score in published] + [b"not json", b'{"team": "Red"}'])
+    assert board.version == 2
+    assert orjson.loads(board.render())["teams"] == [{"name": "Red", "score": 10}, {"name": "Blue", "score": 5}]
@@ -0,0 +1,54 @@
+from conftest import pump
+
+def sid(server, client):
+    return server.socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+
+def errors(client):
+    return [event["args"][0]["message"] for event in client.get_received() if event["name"] == "error"]
+
+def test_late_disconnect_of_a_replaced_socket_keeps_the_player(server, lobby):
+    game_id, connect = lobby
+    players = server.players
+    alice, bob = connect("alice", "Red"), connect("bob", "Blue")
+    # The new socket joins before the old one's disconnect arrives
+    alice_again = connect("alice", "Red")
+    alice.disconnect()
+    pump()
+    assert players.team_of(game_id, "alice") == "Red"
+    assert players.role_of(game_id, "alice") == "leader"
+    assert players.count(game_id) == 2
+    assert players.sid_of(game_id, "alice") == sid(server, alice_again)
+
+    bob.disconnect()
+    pump()
+    assert game_id in server.games
+    assert players.count(game_id) == 1
+    alice_again.disconnect()
+
+def test_rejoin_restores_role_and_roster_team(server, lobby):
+    game_id, connect = lobby
+    players = server.players
+    alice, bob = connect("alice", "Red"), connect("bob", "Blue")
+    alice.disconnect()
+    pump()
+    assert players.team_of(game_id, "alice") is None
+    alice = connect("alice", "Red")
+    assert players.role_of(game_id, "alice") == "leader"
+
+    # A client can't move itself to another team by claiming one on join
+    cheat = connect("bob", "Red")
+    assert errors(cheat) == ["400 Bad Request: bob is on team Blue"]
+    assert players.team_of(game_id, "bob") == "Blue"
+    bob_session = players.get(sid(server, bob))
+    assert bob_session["team"] == "Blue"
+
+    # Trivia credits the session team, which has to agree with the roster
+    game = server.games[game_id]
+    game["phase"] = "trivia"
+    game["data"] = {"buzz": "bob", "question": {"q": "2+2?", "a": "4"}, "answers": {}}
+    bob.emit("trivia_answer", {"answer": "4"})
+    pump()
+    assert game["scores"]["Blue"] == 10
+    assert game["scores"]["Red"] == 0
+    for client in (alice, bob, cheat):
+        client.disconnect()
@@ -0,0 +1,68 @@
+import ratelimit
+from conftest import pump
+
+def throttled(server, bucket):
+    return server.events_throttled.labels(bucket).value
+
+def test_drawing_controls_have_their_own_bucket(server, lobby):
+    game_id, connect = lobby
+    alice = connect("alice", "Red")
+    points, controls = throttled(server, "drawing"), throttled(server, "drawing_control")
+    point = {"x": 1, "y": 1, "drawing": True}
+    for _ in range(int(server.RATE_LIMIT_DRAWING * 3)):
+        alice.emit("drawing", point)
+    assert throttled(server, "drawing") > points
+
+    # A flood of points leaves stroke starts and clears untouched
+    alice.emit("drawing", dict(point, start=True))
+    alice.emit("drawing", {"drawing": False})
+    assert throttled(server, "drawing_control") == controls
+
+    # but they are still limited: a flood of them is dropped as well
+    for _ in range(int(server.RATE_LIMIT_DRAWING_CONTROL * 10)):
+        alice.emit("drawing", dict(point, start=True))
+    assert throttled(server, "drawing_control") - controls >= server.RATE_LIMIT_DRAWING_CONTROL * 7
+    pump()
+    alice.disconnect()
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def limiter(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return ratelimit.RateLimiter(), clock
+
+def allowed(limiter, count, sid="s1", event="guess", rate=4, burst=8):
+    return sum(limiter.allow(sid, event, rate, burst) for _ in range(count))
+
+def test_a_full_bucket_allows_one_burst(monkeypatch):
+    limits, clock = limiter(monkeypatch)
+    assert allowed(limits, 20) == 8
+    assert not limits.allow("s1", "guess", 4, 8)
+
+def test_tokens_refill_at_the_rate_up_to_the_burst(monkeypatch):
+    limits, clock = limiter(monkeypatch)
+    allowed(limits, 8)
+    clock.now += 0.5
+    assert allowed(limits, 5) == 2
+    # Fractions carry over between checks
+    clock.now += 0.125
+    assert allowed(limits, 1) == 0
+    clock.now += 0.125
+    assert allowed(limits, 1) == 1
+    # A long idle spell refills to the burst and no further
+    clock.now += 3600
+    assert allowed(limits, 20) == 8
+
+def test_buckets_are_per_connection_and_event(monkeypatch):
+    limits, clock = limiter(monkeypatch)
+    allowed(limits, 8)
+    assert allowed(limits, 1, event="buzz") == 1
+    assert allowed(limits, 1, sid="s2") == 1
+    limits.forget("s1")
+    assert allowed(limits, 20) == 8
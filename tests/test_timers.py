@@ -0,0 +1,67 @@
+import time
+import eventlet
+from timers import TimerWheel
+
+def wheel(slots=4):
+    timers = TimerWheel(1.0, slots)
+    timers.running = True  # Driven by hand with advance() instead of its greenlet
+    return timers
+
+def advance(timers, ticks):
+    for _ in range(ticks):
+        timers.advance()
+    eventlet.sleep(0)  # Expired callbacks run in their own greenlets
+
+def test_timers_further_out_than_a_revolution_wait_out_their_laps():
+    timers, fired = wheel(slots=4), []
+    timers.arm("far", 10, fired.append, "far")
+    timers.arm("lap", 4, fired.append, "lap")
+    timers.arm("soon", 0.2, fired.append, "soon")
+    advance(timers, 1)
+    assert fired == ["soon"]
+    advance(timers, 3)
+    assert fired == ["soon", "lap"]
+    # "far" has come round to its slot twice by now, once per lap
+    advance(timers, 5)
+    assert fired == ["soon", "lap"]
+    advance(timers, 1)
+    assert fired == ["soon", "lap", "far"]
+    assert timers.timers == {} and all(not slot for slot in timers.slots)
+
+def test_cancel_and_rearm():
+    timers, fired = wheel(), []
+    timers.arm("a", 3, fired.append, "a")
+    timers.cancel("a")
+    timers.cancel("a")
+    timers.cancel("never armed")
+    advance(timers, 8)
+    assert fired == []
+
+    # Arming a key again replaces its timer
+    timers.arm("a", 3, fired.append, "first")
+    timers.arm("a", 6, fired.append, "second")
+    advance(timers, 3)
+    assert fired == []
+    advance(timers, 3)
+    assert fired == ["second"]
+
+    timers.arm("a", 1, fired.append, "again")
+    advance(timers, 1)
+    assert fired == ["second", "again"]
+
+def test_a_failing_callback_does_not_stop_the_others():
+    timers, fired = wheel(), []
+    def fail():
+        raise RuntimeError("boom")
+    timers.arm("bad", 1, fail)
+    timers.arm("good", 1, fired.append, "good")
+    advance(timers, 1)
+    assert fired == ["good"]
+
+def test_the_wheel_greenlet_fires_on_time():
+    timers, fired = TimerWheel(0.01, 8), []
+    started = time.monotonic()
+    timers.arm("a", 0.2, lambda: fired.append(time.monotonic() - started))
+    while not fired and time.monotonic() - started < 2:
+        eventlet.sleep(0.01)
+    assert fired and 0.2 <= fired[0] < 0.5
@@ -0,0 +1,67 @@
+"""Round deadlines for every game on a worker, kept in one hashed timer wheel."""
+import math
+import time
+import logging
+import eventlet
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """Hashed timer wheel driven by a single greenlet.
+
+    Timers hash into a fixed ring of slots by expiry tick, so arm and cancel
+    are O(1) and each tick only touches one slot. A timer further out than one
+    revolution carries a count of remaining laps. Keys are unique: arming an
+    existing key replaces its timer. Each expired callback runs in its own
+    greenlet, so one that waits (Scattergories scoring waits on Gemini) never
+    holds up the other timers.
+    """
+
+    def __init__(self, tick, slots):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]  # key -> [laps, callback, args]
+        self.timers = {}  # key -> slot index
+        self.cursor = 0
+        self.running = False
+
+    def arm(self, key, delay, callback, *args):
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][key] = [(ticks - 1) // len(self.slots), callback, args]
+        self.timers[key] = slot
+        if not self.running:
+            self.running = True
+            eventlet.spawn_n(self.run)
+
+    def cancel(self, key):
+        slot = self.timers.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            eventlet.sleep(max(0.0, next_tick - time.monotonic()))
+            self.advance()
+
+    def advance(self):
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        bucket = self.slots[self.cursor]
+        expired = []
+        for key, timer in bucket.items():
+            if timer[0]:
+                timer[0] -= 1
+            else:
+                expired.append((key, timer))
+        for key, (_, callback, args) in expired:
+            del bucket[key]
+            del self.timers[key]
+            eventlet.spawn_n(self.fire, key, callback, args)
+
+    def fire(self, key, callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Timer {key} failed: {str(e)}")